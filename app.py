@@ -1,210 +1,452 @@
+import time
+run_started = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
+import os
 import traceback
+import numpy as np
+from dataclasses import replace
+from functools import wraps
+
+from catalog import CatalogIndex
+from instrumentation import RerunProfiler
+from ledger import format_amount, format_amounts
+from pricing import QuoteEngine, QuoteSpec
+from quote_cache import QuoteCache
+from snapshot import ConfigError, SnapshotStore
+from solver import BundleSolver
+from workspace import QuoteWorkspace
+
+# The page's own imports; only the first run in a server process pays for them
+import_time = time.perf_counter() - run_started
 
 # Initialize session state if not already done
 if 'init' not in st.session_state:
     st.session_state.init = True
     st.set_page_config(page_title="Product Price Configurator", layout="wide")
 
+# Selected modules, kept apart from the checkboxes since only matching modules are rendered
+if 'selected_modules' not in st.session_state:
+    st.session_state.selected_modules = {}
+
+# Named quote variants saved for comparison
+if 'workspace' not in st.session_state:
+    st.session_state.workspace = QuoteWorkspace()
+
+# Per-phase timings of each rerun, switched on from the internal-only section. `timing_run` is
+# True while the run that owns `profiler` executes, the page's or a fragment-only rerun's
+profiler = RerunProfiler(enabled=st.session_state.get('profile_reruns', False))
+timing_run = True
+PROFILE_LOG = os.environ.get('CONFIGURATOR_PROFILE_LOG', 'rerun_profile.jsonl')
+
+# Custom sorting of topics; modules in other topics are not offered in the picker
+TOPIC_ORDER = [
+    "Regulatory",
+    "Climate",
+    "Risk",
+    "Impact",
+    "Nature & Biodiversity",
+    "Labels",
+    "Raw data",
+    "Benchmarks"
+]
+
+# Modules rendered per page of picker results
+PAGE_SIZE = 60
+
 # Add function to clear all selections
 def clear_all_selections():
     # Clear access method selections
     for method in access_methods.keys():
         st.session_state[f"access_method_{method}"] = False
     
-    # Clear module selections
-    for module in modules_df['Product module']:
-        st.session_state[module] = False
-
-def load_variable_costs():
-    try:
-        df = pd.read_csv('variablecost.csv')
-        # Convert columns 7-15 to float
-        columns_to_convert = df.columns[6:13]  # Columns 7-12 (0-indexed)
-        df[columns_to_convert] = df[columns_to_convert].astype(float)
-        return df
-    except Exception as e:
-        st.error(f"Error loading variablecost.csv: {str(e)}")
-        return pd.DataFrame()
-
-
-variable_costs_df = load_variable_costs()
-
-
-# Load configuration from CSV file
-@st.cache_data
-def load_config():
-    try:
-        return pd.read_csv('config.csv')
-    except Exception as e:
-        st.error(f"Error loading config.csv: {str(e)}")
-        return pd.DataFrame(columns=['Type', 'Key', 'Value'])
-
-config_df = load_config()
-
-@st.cache_data
-def load_access_methods():
-    try:
-        access_methods_df = pd.read_csv('accessmethods.csv')
-        access_method_factors = {}
-        for row in access_methods_df.itertuples(index=False):
-            key = tuple(str(value).lower() == 'true' for value in row[:4])  # Convert first 4 columns to boolean
-            value = float(row[4]) if isinstance(row[4], float) else float(row[4].strip())
-            access_method_factors[key] = value
-        return access_method_factors
-    except Exception as e:
-        st.error(f"Error loading accessmethods.csv: {str(e)}")
-        return {}
-
-#load licences information 
-@st.cache_data
-def load_licenses():
-    try:
-        return pd.read_csv('licenses.csv')
-    except Exception as e:
-        st.error(f"Error loading licenses.csv: {str(e)}")
-        return pd.DataFrame(columns=['Ticket size', '# licenses'])
-
-licenses_df = load_licenses()
-
-def get_included_licenses(total_price):
-    if licenses_df.empty:
-        st.warning("Licenses data is empty or not loaded properly. Using default value of 1 license.")
-        return 1
-    
-    for _, row in licenses_df.iterrows():
-        if total_price <= row['Ticket size']:
-            return row['# licenses']
-    
-    # If we've gone through all rows without finding a match, return the last value
-    if not licenses_df.empty:
-        return licenses_df.iloc[-1]['# licenses']
+    # Clear module selections; checkboxes pick up the new selection when they are next rendered
+    st.session_state.selected_modules = {}
+    for key in [key for key in st.session_state if str(key).startswith('module_')]:
+        del st.session_state[key]
+
+# Replace the current selection with a suggested bundle
+def apply_bundle(modules, access_methods):
+    clear_all_selections()
+    for method in access_methods:
+        st.session_state[f"access_method_{method}"] = True
+    st.session_state.selected_modules = dict.fromkeys(modules)
+
+# Load the quote variant chosen in the comparison back into the editor
+def load_variant():
+    spec = st.session_state.workspace.variants[st.session_state.comparison_variant]
+    apply_bundle(spec.modules, spec.access_methods)
+    st.session_state.currency = spec.currency
+    st.session_state.aum = spec.aum
+    st.session_state.contract_length = spec.contract_length
+    st.session_state.ae_discount = round(spec.ae_discount * 100)
+    st.session_state.extra_licenses = spec.extra_licenses
+
+def remove_variant():
+    st.session_state.workspace.remove(st.session_state.comparison_variant)
+
+# Add or remove a module when its checkbox changes
+def toggle_module(module):
+    if st.session_state[f"module_{module}"]:
+        st.session_state.selected_modules[module] = None
     else:
-        return 1  # Default to 1 license if DataFrame is empty
+        st.session_state.selected_modules.pop(module, None)
 
-#get the price for one license
-def get_license_price(total_price):
-    if licenses_df.empty:
-        st.warning("Licenses data is empty or not loaded properly. Using default value of 1 license.")
-        return 1
-    
-    for _, row in licenses_df.iterrows():
-        if 5000 <= row['Ticket size']:
-            return row['Ticket size']
-    
-    # If we've gone through all rows without finding a match, return the last value
-    if not licenses_df.empty:
-        return licenses_df.iloc[-1]['# licenses']
-    else:
-        return 1  # Default to 1 license if DataFrame is empty
-        
+def show_more_modules():
+    st.session_state.catalog_limit += PAGE_SIZE
 
-@st.cache_data
-def load_label_requirements():
-    try:
-        return pd.read_csv('labels.csv')
-    except Exception as e:
-        st.error(f"Error loading labels.csv: {str(e)}")
-        return pd.DataFrame()
-def get_required_modules_for_label(label_name, labels_df):
-    """Get the required modules based on the metrics count in labels.csv"""
-    label_reqs = labels_df[labels_df['Label name'] == label_name].iloc[0]
-    required_modules = []
-    
-    # Map the requirements to specific modules
-    if int(label_reqs['Exposures']) > 0:
-        required_modules.append('Exposures')
-    
-    if int(label_reqs['ESG Risk']) > 0:
-        required_modules.append('ESG Risk')
-    
-    if int(label_reqs['SFDR PAIs']) > 0:
-        required_modules.append('SFDR PAIs')
-    
-    if int(label_reqs['UN SDGs Alignment']) > 0:
-        required_modules.append('UN SDGs Alignment')
-    
-    if int(label_reqs['Carbon Footprint']) > 0:
-        required_modules.append('Carbon Footprint')
-    
-    if int(label_reqs['EU Taxonomy - product level reporting']) > 0:
-        required_modules.append('EU Taxonomy - product level reporting')
-    
-    # For 'Other' metrics, we'll assume they need the smallest Raw data package
-    if int(label_reqs['Other']) > 0:
-        required_modules.append('Emissions / Up to 10 metrics')
-    
-    return required_modules
+# Pricing tables are compiled into one validated snapshot shared by all sessions, and
+# recompiled only when one of the CSV files changes
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore('.', persist=True)
 
-def check_label_requirements(selected_modules, modules_df, labels_df):
-    # Get all selected labels
-    selected_labels = [module for module in selected_modules 
-                      if module in labels_df['Label name'].values]
-    
-    if not selected_labels:
-        return None
-    
-    missing_requirements = {}
-    
-    for selected_label in selected_labels:
-        required_modules = get_required_modules_for_label(selected_label, labels_df)
-        missing_modules = [module for module in required_modules 
-                         if module not in selected_modules]
-        
-        if missing_modules:
-            missing_requirements[selected_label] = missing_modules
-            
-    return missing_requirements
-    
+# Timings of the first run in this server process, shown with the rerun timings
+@st.cache_resource
+def get_startup_timings():
+    return {}
+
+startup_timings = get_startup_timings()
+cold_start = not startup_timings
+if cold_start:
+    startup_timings['imports'] = import_time
 
-# Extract configurations from the DataFrame
+snapshot_store = get_snapshot_store()
 try:
-    aum_brackets = {row[2].strip(): float(row[3]) for row in config_df[config_df['Type'] == 'AuM Multiplier'].itertuples()}
-    access_methods = {row[2].strip(): float(row[3]) for row in config_df[config_df['Type'] == 'Access Method'].itertuples()}
-    module_discounts = {int(row[2]): float(row[3]) for row in config_df[config_df['Type'] == 'Module Discount'].itertuples()}
-    contract_discounts = {str(row[2]): float(row[3]) for row in config_df[config_df['Type'] == 'Contract Discount'].itertuples()}
-    exchange_rates = {row[2]: eval(row[3]) for row in config_df[config_df['Type'] == 'Exchange Rate'].itertuples()}
-    
-except Exception as e:
-    st.error(f"Error processing configuration data: {str(e)}")
+    with profiler.phase('load tables'):
+        started = time.perf_counter()
+        snapshot = snapshot_store.get()
+        if cold_start:
+            startup_timings['pricing tables'] = time.perf_counter() - started
+except (OSError, ConfigError) as e:
+    st.error(f"Error loading pricing tables: {str(e)}")
     st.stop()  # Stop execution if there's an error
 
-# Load module data from CSV file
-@st.cache_data
-def load_module_data():
-    try:
-        return pd.read_csv('modules.csv')
-    except Exception as e:
-        st.error(f"Error loading modules.csv: {str(e)}")
-        return pd.DataFrame(columns=['Topic', 'Product module', 'Price', 'Webapp (reports only)', 'Webapp (download)', 'API', 'Datafeed'])
-
-modules_df = load_module_data()
-
-# Clean column names by stripping spaces (to avoid issues)
-modules_df.columns = modules_df.columns.str.strip()
-
-# Function to calculate discounts
-def calculate_discount(module_count, contract_length):
-    years = int(contract_length.split()[0])
-    module_discount = module_discounts.get(module_count, module_discounts[7] if module_count > 7 else 0)
-    contract_discount = contract_discounts.get(contract_length)
-    total_discount = 1 - (1 - module_discount) * (1 - contract_discount)
-    return total_discount
-
-# Function to format price based on currency
-def format_price(price, currency):
-    if currency == 'EUR':
-        return f"€{price:,.2f}"
-    elif currency == 'USD':
-        return f"${price:,.2f}"
-    elif currency == 'GBP':
-        return f"£{price:,.2f}"
+aum_brackets = snapshot.aum_brackets
+access_methods = snapshot.access_methods
+contract_discounts = snapshot.contract_discounts
+exchange_rates = snapshot.exchange_rates
+
+# Search and filter index over the offered modules, built once per snapshot
+@st.cache_resource(max_entries=2)
+def get_catalog_index(version, _engine):
+    return CatalogIndex.from_engine(_engine, TOPIC_ORDER)
+
+# Build the pricing engine once per snapshot
+@st.cache_resource(max_entries=2)
+def get_quote_engine(version, _snapshot):
+    return QuoteEngine.from_snapshot(_snapshot)
+
+# Finished quotes, shared by all sessions
+@st.cache_resource
+def get_quote_cache():
+    return QuoteCache(max_entries=4096, ttl=3600)
+
+quote_cache = get_quote_cache()
+
+# Bundle solver over the modules offered in the picker, once per snapshot
+@st.cache_resource(max_entries=2)
+def get_bundle_solver(version, _engine):
+    offered = [m for m, topic in zip(_engine.module_names, _engine.topics) if topic in TOPIC_ORDER]
+    return BundleSolver(_engine, candidates=offered)
+
+# pandas takes longer to import than the rest of the page and is only needed for tables, so the
+# empty first page renders without it
+def data_frame(data, **kwargs):
+    import pandas as pd
+    return pd.DataFrame(data, **kwargs)
+
+# Timings table for one run, appended to the profile log if asked to
+def show_timings(profiler, scope):
+    rows = profiler.rows() + [('total', profiler.elapsed() * 1000, None, None)]
+    st.table(data_frame(rows, columns=['Phase', 'Time (ms)', 'Allocated blocks', 'Calls']))
+    if st.session_state.get('profile_log'):
+        profiler.append_jsonl(PROFILE_LOG, scope=scope, modules=len(st.session_state.selected_modules))
+
+# Widgets inside a fragment only rerun that fragment; it is called again with the arguments
+# of the last full run, so those act as its memoized inputs. A fragment-only rerun gets a
+# profiler of its own and shows its timings at the end of the fragment.
+def fragment(function):
+    @wraps(function)
+    def run(*args):
+        global profiler, timing_run
+        if timing_run:
+            return function(*args)
+        profiler = RerunProfiler(enabled=st.session_state.get('profile_reruns', False))
+        timing_run = True
+        try:
+            function(*args)
+        finally:
+            timing_run = False
+        if profiler.enabled:
+            st.caption(f"Timings of this {function.__name__} rerun")
+            show_timings(profiler, function.__name__)
+    return st.fragment(run)
+
+# Module picker: search, topic and availability filters over the catalog index, rendering
+# only one page of matches. Filtering and paging rerun just the picker; a changed selection
+# reruns the whole page.
+@fragment
+def module_picker(catalog, access_mask, selected):
+    col_search, col_topics, col_available = st.columns(3)
+    query = col_search.text_input("Search modules", key='catalog_query')
+    topics = col_topics.multiselect("Topics", catalog.topic_order, key='catalog_topics')
+    available_only = col_available.checkbox("Only modules available with the selected access methods",
+                                            key='catalog_available_only')
+
+    with profiler.phase('catalog search'):
+        ids = catalog.ids(catalog.filter(query, topics, access_mask if available_only else 0))
+    filter_key = (query, tuple(topics), available_only)
+    if st.session_state.get('catalog_filter') != filter_key:
+        st.session_state.catalog_filter = filter_key
+        st.session_state.catalog_limit = PAGE_SIZE
+    limit = st.session_state.catalog_limit
+
+    with profiler.phase('module checkboxes'):
+        groups = catalog.grouped(ids[:limit])
+        topics_per_column = max(1, -(-len(groups) // 3))  # Ceiling division to distribute evenly
+        for column, start_idx in zip(st.columns(3), range(0, len(groups), topics_per_column)):
+            with column:
+                for topic, modules in groups[start_idx:start_idx + topics_per_column]:
+                    with st.expander(f"**{topic}**", expanded=bool(query.strip() or topics)):
+                        for module in modules:
+                            st.checkbox(module, value=module in selected, key=f"module_{module}",
+                                        on_change=toggle_module, args=(module,))
+
+    if not len(ids):
+        st.info("No modules match the search.")
+    elif len(ids) > limit:
+        st.button(f"Show more ({len(ids) - limit} more)", on_click=show_more_modules)
+    if selected:
+        st.caption(f"Selected: {', '.join(selected)}")
+
+    # Everything below the picker depends on the selection
+    if tuple(st.session_state.selected_modules) != selected:
+        st.rerun()
+
+# Suggest the cheapest bundle meeting the client's labels and modules
+@fragment
+def bundle_suggestion(engine, version, currency, aum, contract_length, catalog):
+    with st.expander("**Suggest cheapest bundle**", expanded=False), profiler.phase('bundle suggestion'):
+        solver = get_bundle_solver(version, engine)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            required_labels = st.multiselect("Client labels", engine.labels.labels)
+        with col2:
+            # Options are the modules already chosen plus one page of search matches, never the whole catalog
+            query = st.text_input("Find required modules", key='required_query')
+            chosen = st.session_state.get('required_modules', [])
+            matches = catalog.ids(catalog.filter(query) & catalog.unlabelled)[:PAGE_SIZE]
+            options = list(dict.fromkeys(chosen + [catalog.names[i] for i in matches.tolist()]))
+            required_modules = st.multiselect("Required modules", options, key='required_modules')
+        with col3:
+            required_methods = st.multiselect("Required access methods", list(access_methods))
+        allow_extras = st.checkbox("Add modules when the bundle discount makes the total cheaper", value=True)
+
+        if required_labels or required_modules:
+            bundle = solver.cheapest(currency, aum, contract_length, required_labels, required_modules,
+                                     required_methods, allow_extras)
+            if bundle is None:
+                st.warning("No valid configuration covers these requirements.")
+            else:
+                st.table(data_frame({
+                    'Product module': bundle.quote.modules,
+                    'Final Price': bundle.quote.ledger.formatted('final_price')['final_price'],
+                }))
+                st.write(f"Access methods: {', '.join(bundle.access_methods)}")
+                if bundle.extras:
+                    st.write(f"Added for the bundle discount: {', '.join(bundle.extras)}")
+                st.markdown(f"**Total: {format_amount(bundle.quote.ledger.final_total, currency)}**")
+                # The new selection changes the whole page
+                if st.button("Use this bundle", on_click=apply_bundle, args=(bundle.modules, bundle.access_methods)):
+                    st.rerun()
+
+# Module prices for the selection; changing the AE discount only reruns this section
+@fragment
+def price_sheet(engine, version, base_spec):
+    # Add AE Discount column with dropdown selection for up to 15%
+    ae_discount_options = [0, 5, 10, 15]  # Define options for AE Discount
+    col_ae_discount = st.columns(3)[0]  # Create a column that takes up one-third of the page
+    ae_discount_percentage = col_ae_discount.selectbox("Select AE Discount (%)", ae_discount_options, key='ae_discount') / 100  # Dropdown for AE Discount
+
+    spec = replace(base_spec, ae_discount=ae_discount_percentage)
+    quote = quote_cache.get_or_compute(version, spec, lambda spec: engine.quote(spec, profiler))
+    currency = spec.currency
+
+    with profiler.phase('table rendering'):
+        # Display results table with the discount breakdown, formatted from the ledger in one pass
+        lines = quote.ledger.formatted('list_price', 'bundle_discount', 'multi_year_discount', 'ae_discount',
+                                       'final_price')
+        st.table(data_frame({
+            'Topic': quote.topics,
+            'Product module': quote.modules,
+            'List Price': lines['list_price'],
+            f"Bundle Discount ({quote.bundle_discount:.2%})": lines['bundle_discount'],
+            f"Multi-Year Discount ({quote.multi_year_discount:.2%})": lines['multi_year_discount'],
+            f"AE Discount ({quote.ae_discount:.2%})": lines['ae_discount'],
+            'Final Price': lines['final_price'],
+        }))
+
+        # Display incompatible module-access method combinations
+        if quote.incompatible:
+            st.markdown("### **Incompatible Access Methods**")
+            for module, method in quote.incompatible:
+                st.markdown(
+                    f'<p style="color: red;">⚠️ {module} is not available with {method}</p>',
+                    unsafe_allow_html=True,
+                )
+
+    license_total(engine, version, quote, ae_discount_options)
+
+# Licenses and total; changing the number of additional licenses only reruns this section
+@fragment
+def license_total(engine, version, quote, ae_discount_options):
+    currency = quote.spec.currency
+
+    # Display results in three columns
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        # Allow user to add extra licenses
+        st.subheader("Licenses")
+        extra_licenses = st.number_input("Additional licenses", min_value=0, max_value=engine.max_extra_licenses,
+                                         step=1, key='extra_licenses')
+        quote = engine.with_extra_licenses(quote, extra_licenses)
+        if not snapshot.licenses['Ticket size']:
+            st.warning("Licenses data is empty or not loaded properly. Using default value of 1 license.")
+        total_licenses = quote.included_licenses + extra_licenses
+        st.write(f"{total_licenses} ({quote.included_licenses} included + {extra_licenses} additional)")
+    with col2:
+        st.subheader("Included Service Level")
+        st.write("to be added")  # Empty for now, as requested
+    with col3:
+        st.subheader("Total Price")
+        st.markdown(f"**<p style='font-size: 24px;'>{format_amount(quote.ledger.final_total, currency)}</p>**", unsafe_allow_html=True)
+
+    # What-if totals for every currency, AuM bracket, contract length and AE discount.
+    # The grid is kept in session state and only recomputed when the selection changes.
+    cube_key = (version, quote.modules, quote.spec.access_methods, extra_licenses)
+    if st.session_state.get('price_cube_key') != cube_key:
+        with profiler.phase('what-if grid'):
+            st.session_state.price_cube = engine.price_cube(
+                quote.modules, quote.spec.access_methods, [x / 100 for x in ae_discount_options], extra_licenses)
+        st.session_state.price_cube_key = cube_key
+    cube = st.session_state.price_cube
+
+    with st.expander("**What if...**", expanded=False):
+        col_currency, col_ae = st.columns(3)[:2]
+        what_if_currency = col_currency.selectbox("Currency", cube.currencies, index=cube.currencies.index(currency), key=f"what_if_currency_{currency}")
+        what_if_ae = col_ae.selectbox("AE Discount (%)", ae_discount_options, index=ae_discount_options.index(round(quote.ae_discount * 100)), key=f"what_if_ae_{quote.ae_discount}")
+        matrix = cube.matrix(what_if_currency, what_if_ae / 100)
+        st.table(data_frame(
+            format_amounts(matrix, what_if_currency),
+            index=cube.aum_brackets,
+            columns=cube.contract_lengths,
+        ).rename_axis("AuM Bracket"))
+
+    st.divider()
+
+    st.markdown("#### **<span style='color: red;'>Additional Information - Internal only</span>**", unsafe_allow_html=True)
+    st.write(f"Exchange rate: 1 USD = {1/quote.exchange_rate:.2f} {currency}")
+    st.write(f"Cost per additional license: {format_amount(quote.ledger.license_price, currency)}")
+
+    cache_stats = quote_cache.stats()
+    st.write(
+        f"Quote cache: {cache_stats.hits} hits, {cache_stats.misses} misses "
+        f"({cache_stats.hit_rate:.1%} hit rate), {cache_stats.evictions} evicted, "
+        f"{cache_stats.expirations} expired, {cache_stats.entries} entries, "
+        f"{cache_stats.memory / 1024:,.1f} KiB"
+    )
+
+# Variable costs depend on neither the AE discount nor the licenses
+@fragment
+def variable_costs(engine, version, base_spec):
+    quote = quote_cache.get_or_compute(version, base_spec, lambda spec: engine.quote(spec, profiler))
+    currency = base_spec.currency
+
+    with profiler.phase('table rendering'):
+        # Variable costs only apply where the module's vendor supports a selected access method
+        st.table(data_frame({
+            'Topic': quote.topics,
+            'Product module': quote.modules,
+            'Variable Cost': quote.ledger.formatted('variable_cost')['variable_cost'],
+        }))
+
+        # Aggregate the variable costs per vendor
+        vendor_costs = {vendor: cost for vendor, cost in engine.variable_costs_by_vendor(quote).items() if cost}
+        if vendor_costs:
+            st.table(data_frame({
+                'Vendor': list(vendor_costs),
+                'Variable Cost': format_amounts(list(vendor_costs.values()), currency),
+            }))
+
+# Saved quote variants side by side. Saving, removing and choosing variants only reruns this
+# section, and only new or changed variants are repriced
+@fragment
+def quote_comparison(engine, version, base_spec):
+    workspace = st.session_state.workspace
+    st.header("Compare quotes")
+    col_name, col_save = st.columns(3, vertical_alignment='bottom')[:2]
+    name = col_name.text_input("Variant name", placeholder=f"Option {len(workspace) + 1}", key='variant_name')
+    if col_save.button("Save current quote as variant", disabled=base_spec is None):
+        # The AE discount and licenses are set in their own sections, so take them from their widgets
+        workspace.save(name.strip() or f"Option {len(workspace) + 1}", replace(
+            base_spec,
+            ae_discount=st.session_state.get('ae_discount', 0) / 100,
+            extra_licenses=st.session_state.get('extra_licenses', 0),
+        ))
+    if not len(workspace):
+        st.write("Save the current quote to compare it with alternatives.")
+        return
+
+    with profiler.phase('quote comparison'):
+        results = workspace.price(engine, version)
+    for variant, error in workspace.errors.items():
+        st.warning(f"{variant} no longer prices: {error}")
+
+    if results:
+        with profiler.phase('table rendering'):
+            summary = {}
+            for variant, quote in results.items():
+                spec, ledger = quote.spec, quote.ledger
+                list_total = int(ledger.list_price.sum())
+                amounts = format_amounts([list_total, list_total - ledger.total, ledger.extra_license_cost,
+                                          ledger.final_total, ledger.variable_total], spec.currency)
+                summary[variant] = [
+                    spec.currency, spec.aum, spec.contract_length, ', '.join(spec.access_methods),
+                    str(len(spec.modules)), f"{spec.ae_discount:.0%}", str(spec.extra_licenses), *amounts,
+                ]
+            st.table(data_frame(summary, index=[
+                'Currency', 'AuM Bracket', 'Contract Length', 'Access Methods', 'Modules', 'AE Discount',
+                'Additional Licenses', 'List Price', 'Discounts', 'Additional License Cost', 'Total Price',
+                'Variable Cost',
+            ]))
+
+            # Final price of every module in any variant, in catalog order
+            module_ids = np.unique(np.concatenate([quote.module_ids for quote in results.values()]))
+            prices = {}
+            for variant, quote in results.items():
+                column = np.full(len(module_ids), '-', dtype=object)
+                column[np.searchsorted(module_ids, quote.module_ids)] = quote.ledger.formatted('final_price')['final_price']
+                prices[variant] = column
+            st.table(data_frame(prices, index=[engine.module_names[i] for i in module_ids.tolist()]))
+        st.caption(f"Repriced {workspace.repriced} of {len(workspace)} variants on this run")
+
+    col_variant, col_load, col_remove = st.columns(3, vertical_alignment='bottom')
+    col_variant.selectbox("Variant", list(workspace.variants), key='comparison_variant')
+    # Loading a variant changes the whole page
+    if col_load.button("Load into editor", on_click=load_variant):
+        st.rerun()
+    col_remove.button("Remove variant", on_click=remove_variant)
 
 # Main application logic
 def main():
+    global timing_run
     try:
-        access_method_factors = load_access_methods()  # Load access methods
+        with profiler.phase('load tables'):
+            started = time.perf_counter()
+            engine = get_quote_engine(snapshot.version, snapshot)
+            if cold_start:
+                startup_timings['pricing engine'] = time.perf_counter() - started
         
         # Create two columns for title and clear button
         col_title, col_button = st.columns([5,1])
@@ -213,245 +455,85 @@ def main():
         with col_button:
             st.button("Clear All Selections", on_click=clear_all_selections, type="secondary")
 
+        if snapshot_store.error:
+            st.warning(f"Price list update rejected, still using the previous version: {snapshot_store.error}")
+
 
         # User inputs
         col1, col2, col3 = st.columns(3)
         with col1:
-            currency = st.selectbox("Select Currency", list(exchange_rates.keys()))
+            currency = st.selectbox("Select Currency", list(exchange_rates.keys()), key='currency')
         with col2:
-            aum = st.selectbox("Select AuM Bracket", list(aum_brackets.keys()))
+            aum = st.selectbox("Select AuM Bracket", list(aum_brackets.keys()), key='aum')
         with col3:
-            contract_length = st.selectbox("Select Contract Length", list(contract_discounts.keys()))
+            contract_length = st.selectbox("Select Contract Length", list(contract_discounts.keys()), key='contract_length')
 
         st.subheader("Access Methods")
         cols = st.columns(len(access_methods))
         selected_access_methods = {}
         for i, method in enumerate(access_methods.keys()):
             with cols[i]:
-                selected_access_methods[method] = st.checkbox(f"{method}")
+                selected_access_methods[method] = st.checkbox(f"{method}", key=f"access_method_{method}")
 
         st.subheader("Select Product Modules")
-        selected_modules = []
-        
-        # Custom sorting of topics
-        custom_order = [
-            "Regulatory",
-            "Climate",
-            "Risk",
-            "Impact",
-            "Nature & Biodiversity",
-            "Labels",
-            "Raw data",
-            "Benchmarks"
-        ]
-        
-        # Sort modules based on custom order
-        modules_df['Topic'] = pd.Categorical(modules_df['Topic'], categories=custom_order, ordered=True)
-        modules_df.sort_values('Topic', inplace=True)
+        with profiler.phase('catalog layout'):
+            catalog = get_catalog_index(snapshot.version, engine)
+
+        # Modules dropped from the price list since they were selected are ignored
+        selected_modules = [module for module in st.session_state.selected_modules if module in engine.module_ids]
+        access_mask = engine.access_mask(method for method, selected in selected_access_methods.items() if selected)
+        module_picker(catalog, access_mask, tuple(st.session_state.selected_modules))
+
+        bundle_suggestion(engine, snapshot.version, currency, aum, contract_length, catalog)
 
-        # Create three columns
-        col1, col2, col3 = st.columns(3)
-        
-        # Group modules by Topic
-        grouped_modules = modules_df.groupby('Topic')
-        
-        # Distribute topics across columns
-        topics = list(grouped_modules.groups.keys())
-        topics_per_column = -(-len(topics) // 3)  # Ceiling division to distribute evenly
-        
-        for i, (column, start_idx) in enumerate(zip([col1, col2, col3], range(0, len(topics), topics_per_column))):
-            with column:
-                for topic in topics[start_idx:start_idx + topics_per_column]:
-                    group = grouped_modules.get_group(topic)
-                    with st.expander(f"**{topic}**", expanded=False):
-                        for _, row in group.iterrows():
-                            if st.checkbox(f"{row['Product module']}", key=row['Product module']):
-                                selected_modules.append(row['Product module'])
-        
-        # Process selected modules
-        if selected_modules:
-            # Load labels data
-            labels_df = load_label_requirements()
-                
         # check requirements for labels
         if selected_modules:
-            # Load labels data
-            labels_df = load_label_requirements()
-            
-            # Check requirements for any selected labels
-            missing_requirements = check_label_requirements(selected_modules, modules_df, labels_df)
-            
+            with profiler.phase('label checks'):
+                missing_requirements = engine.labels.missing(engine.module_ids_for(selected_modules), engine.module_names)
+
             if missing_requirements:
-                            st.markdown("### **Label Requirements Check**")
-                            for label, missing_modules in missing_requirements.items():
-                                label_reqs = labels_df[labels_df['Label name'] == label].iloc[0]
-                                for module in missing_modules:
-                                    # Map module to its requirement count from labels.csv
-                                    if module == 'Exposures':
-                                        count = label_reqs['Exposures']
-                                    elif module == 'ESG Risk':
-                                        count = label_reqs['ESG Risk']
-                                    elif module == 'SFDR PAIs':
-                                        count = label_reqs['SFDR PAIs']
-                                    elif module == 'UN SDGs Alignment':
-                                        count = label_reqs['UN SDGs Alignment']
-                                    elif module == 'Carbon Footprint':
-                                        count = label_reqs['Carbon Footprint']
-                                    elif module == 'EU Taxonomy - product level reporting':
-                                        count = label_reqs['EU Taxonomy - product level reporting']
-                                    elif module == 'Emissions / Up to 10 metrics':
-                                        count = label_reqs['Other']
-                                        
-                                    st.markdown(
-                                        f'<p style="color: orange;">⚠️ {label} requires {int(count)} metrics from {module}</p>',
-                                        unsafe_allow_html=True
-                                    )
+                st.markdown("### **Label Requirements Check**")
+                for label, missing_modules in missing_requirements.items():
+                    for module, count in missing_modules:
+                        st.markdown(
+                            f'<p style="color: orange;">⚠️ {label} requires {count} metrics from {module}</p>',
+                            unsafe_allow_html=True
+                        )
             st.divider()
     
             st.header("Price sheet")
-            selected_df = modules_df[modules_df['Product module'].isin(selected_modules)].copy()
-    
-            # Ensure 'Price' is numeric
-            selected_df['Price'] = pd.to_numeric(selected_df['Price'], errors='coerce')
-        
-            # Calculate list price
-            selected_df['List Price'] = selected_df['Price'] * aum_brackets[aum] * exchange_rates[currency]
-        
-            # Initialize access method multiplier
-            access_method_keys = (
-                bool(selected_access_methods.get('Webapp (reports only)', False)),
-                bool(selected_access_methods.get('Webapp (download)', False)),
-                bool(selected_access_methods.get('API', False)),
-                bool(selected_access_methods.get('Datafeed', False))
-            )
-
-            
-            # Get the access_multiplier based on selected access methods
-            access_multiplier = access_method_factors.get(access_method_keys, 0)  # Default to 0 if no match found
-
-
-
-            # Apply total access multiplier
-            selected_df['List Price'] *= (1 + access_multiplier)
-        
-            # Calculate discounts
-            bundle_discount = calculate_discount(len(selected_modules), "1 year")  # Use existing function for bundle discount
-            multi_year_discount = contract_discounts.get(contract_length) /100 # Calculate multi-year discount based on contract length
-        
-            # Add new discount columns
-            selected_df['Bundle Discount'] = f"{bundle_discount:.2%}"
-            selected_df['Multi-Year Discount'] = f"{multi_year_discount:.2%}"
-        
-            # Add AE Discount column with dropdown selection for up to 15%
-            ae_discount_options = [0, 5, 10, 15]  # Define options for AE Discount
-            col_ae_discount = st.columns(3)[0]  # Create a column that takes up one-third of the page
-            ae_discount_percentage = col_ae_discount.selectbox("Select AE Discount (%)", ae_discount_options) / 100  # Dropdown for AE Discount
-            selected_df['AE Discount'] = f"{ae_discount_percentage:.2%}"
-        
-            # Calculate final price considering all discounts
-            selected_df['Final Price'] = selected_df['List Price'].astype(float) * (1 - bundle_discount) * (1 - multi_year_discount) * (1 - ae_discount_percentage)
-        
-            # Format prices for display
-            selected_df['List Price'] = selected_df['List Price'].apply(lambda x: format_price(x, currency))
-            selected_df['Final Price'] = selected_df['Final Price'].apply(lambda x: format_price(x, currency))
-        
-            # Display results table with new columns
-            st.table(selected_df[['Topic', 'Product module', 'List Price', 'Bundle Discount', 'Multi-Year Discount', 'AE Discount', 'Final Price']])
-        
-
-            # Check incompatible module-access method combinations
-            incompatible_combinations = []
-            for module in selected_modules:
-                module_row = modules_df[modules_df['Product module'] == module].iloc[0]
-                for method, selected in selected_access_methods.items():
-                    # Ensure proper handling of availability column (True or False)
-                    if selected == True:
-                        if selected != module_row[method]: 
-                            incompatible_combinations.append((module, method))
-                        
-            
-            # Display incompatible combinations
-            if incompatible_combinations:
-                st.markdown("### **Incompatible Access Methods**")
-                for module, method in incompatible_combinations:
-                    st.markdown(
-                        f'<p style="color: red;">⚠️ {module} is not available with {method}</p>',
-                        unsafe_allow_html=True,
-                    )
-
-        
-                    # Calculate total price
-            total_price = selected_df['Final Price'].str.replace(r'[^\d.]', '', regex=True).astype(float).sum()
-
-            # Determine included licenses
-            included_licenses = get_included_licenses(total_price)
-
-
-
-            # Display results in three columns
-            col1, col2, col3 = st.columns(3)
-            with col1:
-    
-                # Allow user to add extra licenses
-                st.subheader("Licenses")
-                extra_licenses = st.number_input("Additional licenses", min_value=0, value=0, step=1)
-                license_cost = get_license_price(total_price)  # Set the cost per additional license (adjust as needed)
-                total_licenses = included_licenses + extra_licenses
-                extra_license_cost = extra_licenses * license_cost
-    
-                st.write(f"{total_licenses} ({included_licenses} included + {extra_licenses} additional)")
-        
-                # Update total price with extra license cost
-                final_total_price = total_price + extra_license_cost
-            with col2:
-                st.subheader("Included Service Level")
-                st.write("to be added")  # Empty for now, as requested
-            with col3:
-                st.subheader("Total Price")
-                st.markdown(f"**<p style='font-size: 24px;'>{format_price(final_total_price, currency)}</p>**", unsafe_allow_html=True)
-
-            st.divider()
-                        
-            st.markdown("#### **<span style='color: red;'>Additional Information - Internal only</span>**", unsafe_allow_html=True)            
-            st.write(f"Exchange rate: 1 USD = {1/exchange_rates[currency]:.2f} {currency}")
-            st.write(f"Cost per additional license: {format_price(license_cost, currency)}")
-
-         
-            # Calculate variable costs
-            aum_column = next(col for col in variable_costs_df.columns if aum in col)
-            
-            # Create a function to check if the variable cost should be applied
-            def should_apply_variable_cost(row, selected_access_methods, access_methods):
-                # Dynamically check access methods based on keys in access_methods
-                return any(selected_access_methods.get(method, False) and row.get(method, False) for method in access_methods.keys())
-            
-            # Apply variable costs only if the appropriate access method is selected
-            selected_df['Variable Cost'] = selected_df.apply(
-                lambda row: (
-                    variable_costs_df.loc[
-                        variable_costs_df['Product module'] == row['Product module'], 
-                        aum_column
-                    ].values[0] * exchange_rates[currency]  # Multiply by exchange rate
-                ) if not variable_costs_df[variable_costs_df['Product module'] == row['Product module']].empty and 
-                should_apply_variable_cost(
-                    variable_costs_df.loc[variable_costs_df['Product module'] == row['Product module']].iloc[0],
-                    selected_access_methods,
-                    access_methods
-                ) else 0,
-                axis=1
-            )
-            
-            # Format Variable Cost as currency
-            selected_df['Variable Cost'] = selected_df['Variable Cost'].apply(lambda x: format_price(x, currency))
-            
-            # Update the table display to include Variable Cost
-            st.table(selected_df[['Topic', 'Product module', 'Variable Cost']])
-
 
+            base_spec = engine.canonical_spec(QuoteSpec(
+                currency=currency,
+                aum=aum,
+                contract_length=contract_length,
+                access_methods=tuple(method for method, selected in selected_access_methods.items() if selected),
+                modules=tuple(selected_modules),
+            ))
+            price_sheet(engine, snapshot.version, base_spec)
+            variable_costs(engine, snapshot.version, base_spec)
+            quote_comparison(engine, snapshot.version, base_spec)
+
+            col_profile, col_log = st.columns(3)[:2]
+            col_profile.checkbox("Show rerun timings", key='profile_reruns')
+            col_log.checkbox(f"Append timings to {PROFILE_LOG}", key='profile_log', disabled=not profiler.enabled)
+
+            if profiler.enabled:
+                show_timings(profiler, 'page')
+                st.caption("First run in this server process: " + ", ".join(
+                    f"{name} {seconds * 1000:,.0f} ms" for name, seconds in startup_timings.items()))
+
+        elif len(st.session_state.workspace):
+            # Saved variants stay comparable while the editor is empty
+            quote_comparison(engine, snapshot.version, None)
         
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.error(traceback.format_exc())
+    finally:
+        timing_run = False
+        if cold_start:
+            startup_timings['first page'] = time.perf_counter() - run_started
     
 # Run the application
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+"""Batch quoting: price a stream of quote specs from JSONL or CSV.
+
+    python batch.py quotes.jsonl -o priced.jsonl
+    python batch.py quotes.csv -o priced.csv --chunk-size 20000
+
+Each input record has `currency`, `aum`, `contract_length`, `access_methods`,
+`modules`, and optionally `ae_discount` (fraction, e.g. 0.1), `extra_licenses`
+and `id`. In CSV input the two list fields are separated by ';'. Records are
+read and written one chunk at a time, so memory stays bounded on any file size.
+
+Prices are unrounded floats; `total_minor` and `final_total_minor` are the
+quote ledger's totals in minor currency units (cents), as shown in the app.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from pricing import QuoteSpec, load_engine
+
+RESULT_FIELDS = [
+    'list_price', 'bundle_discount', 'multi_year_discount', 'total_price', 'included_licenses',
+    'license_price', 'extra_license_cost', 'final_total_price', 'variable_cost', 'incompatible',
+    'missing_labels', 'total_minor', 'final_total_minor',
+]
+OUTPUT_FIELDS = ['id', 'currency', 'aum', 'contract_length', 'modules'] + RESULT_FIELDS + ['error']
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return ()
+    if isinstance(value, str):
+        return tuple(item.strip() for item in value.split(';') if item.strip())
+    return tuple(value)
+
+
+def _count(value):
+    number = float(value or 0)
+    if not number.is_integer():
+        raise ValueError(f"extra_licenses must be a whole number: {value}")
+    return int(number)
+
+
+def parse_spec(record):
+    return QuoteSpec(
+        currency=record['currency'],
+        aum=record['aum'],
+        contract_length=record['contract_length'],
+        access_methods=_as_list(record.get('access_methods')),
+        modules=_as_list(record.get('modules')),
+        ae_discount=float(record.get('ae_discount') or 0),
+        extra_licenses=_count(record.get('extra_licenses')),
+    )
+
+
+class RecordError(ValueError):
+    """An input record that could not be read; price_chunk turns it into an error row."""
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield RecordError(f"line {number}: invalid JSON: {e}")
+
+
+def price_chunk(engine, records):
+    """Price one chunk of records, returning one output row per record."""
+    specs, rows = [], []
+    for record in records:
+        row = {'id': None, 'error': None}
+        try:
+            if isinstance(record, RecordError):
+                raise record
+            if not isinstance(record, dict):
+                raise TypeError(f"expected an object, got {type(record).__name__}")
+            row['id'] = record.get('id')
+            spec = parse_spec(record)
+            # Validate up front so one bad record cannot fail its whole chunk
+            engine.check_spec(spec)
+        except (KeyError, TypeError, ValueError) as e:
+            row['error'] = str(e)
+            rows.append(row)
+            continue
+        row.update(currency=spec.currency, aum=spec.aum, contract_length=spec.contract_length,
+                   modules=len(spec.modules))
+        specs.append(spec)
+        rows.append(row)
+
+    result = engine.quote_batch(specs)
+    columns = [getattr(result, field).tolist() for field in RESULT_FIELDS]
+    priced = (row for row in rows if row['error'] is None)
+    for row, values in zip(priced, zip(*columns)):
+        row.update(zip(RESULT_FIELDS, values))
+    return rows
+
+
+class _Writer:
+    def __init__(self, stream, fmt, fields=OUTPUT_FIELDS):
+        self.stream = stream
+        self.csv = csv.DictWriter(stream, fields) if fmt == 'csv' else None
+        if self.csv:
+            self.csv.writeheader()
+
+    def write(self, rows):
+        if self.csv:
+            self.csv.writerows(rows)
+        else:
+            self.stream.writelines(json.dumps(row) + '\n' for row in rows)
+
+
+def _format_for(path, explicit):
+    if explicit:
+        return explicit
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def run(input_path, output_path, directory='.', chunk_size=10000, input_format=None,
+        output_format=None, log=sys.stderr):
+    engine = load_engine(directory)
+    in_fmt = _format_for(input_path, input_format)
+    out_fmt = _format_for(output_path, output_format)
+    source = sys.stdin if input_path == '-' else open(input_path, newline='', encoding='utf-8')
+    target = sys.stdout if output_path == '-' else open(output_path, 'w', newline='', encoding='utf-8')
+
+    priced = failed = 0
+    start = time.perf_counter()
+    try:
+        records = read_records(source, in_fmt)
+        writer = _Writer(target, out_fmt)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            rows = price_chunk(engine, chunk)
+            writer.write(rows)
+            failed += sum(row['error'] is not None for row in rows)
+            priced += len(rows)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    elapsed = time.perf_counter() - start
+    rate = priced / elapsed if elapsed else float('inf')
+    print(f"Priced {priced} quotes ({failed} failed) in {elapsed:.2f}s: {rate:,.0f} quotes/s", file=log)
+    return priced, failed
+
+
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price a batch of quote specs from JSONL or CSV.")
+    parser.add_argument('input', help="Input file of quote specs ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="Output file ('-' for stdout)")
+    parser.add_argument('--tables', default='.', help="Directory containing the pricing CSVs")
+    parser.add_argument('--chunk-size', type=positive_int, default=10000, help="Quotes priced per chunk")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'])
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'])
+    args = parser.parse_args(argv)
+    run(args.input, args.output, args.tables, args.chunk_size, args.input_format, args.output_format)
+
+
+if __name__ == '__main__':
+    main()
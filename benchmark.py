@@ -0,0 +1,288 @@
+"""Benchmarks for quoting and app reruns on synthetic pricing tables.
+
+    python benchmark.py --scales 10,1000,100000 -o bench.json
+    python benchmark.py -o after.json --compare bench.json --threshold 0.1
+
+For each scale (number of product modules) a complete set of pricing CSVs is
+generated in a temporary directory: labels, license tiers, variable costs
+and requirement columns all grow with the catalog. The suite measures table
+load time, single-quote latency, batch throughput, label checks, variable
+costs and Streamlit script reruns (headless, via streamlit.testing), and
+writes the results as JSON. With --compare, every metric is checked against
+a saved baseline and the exit status is 1 if any regressed by more than the
+threshold.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, timezone
+from itertools import combinations
+
+import numpy as np
+
+from batch import parse_spec
+from loadtest import random_specs
+from pricing import QuoteEngine
+from snapshot import compile_snapshot, load_snapshot
+from workspace import QuoteWorkspace
+
+AUM_BRACKETS = {'<0.5Bn': 0.40, '0.5-1Bn': 0.52, '1-5Bn': 0.62, '5-15Bn': 0.80, '15-25Bn': 1.00,
+                '25-50Bn': 1.40, '50-250Bn': 1.80, '250+Bn': 2.20}
+ACCESS_METHODS = {'Webapp (reports only)': -0.15, 'Webapp (download)': 0, 'API': 0, 'Datafeed': 0.15}
+EXCHANGE_RATES = {'EUR': '1/1.09', 'GBP': '0.86/1.09', 'USD': '1/1'}
+CONTRACT_DISCOUNTS = {'1 year': 0, '2 year': 10, '3 year': 15}
+TOPICS = ('Regulatory', 'Climate', 'Risk', 'Impact', 'Nature & Biodiversity', 'Raw data', 'Benchmarks')
+
+# Metrics where a larger value is better; for all others smaller is better
+HIGHER_IS_BETTER = ('_per_s',)
+
+
+def _write(path, header, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate_tables(directory, modules=1000, labels=None, license_tiers=None, requirements=None, seed=0):
+    """Write a consistent set of synthetic pricing CSVs for `modules` product modules."""
+    rng = random.Random(seed)
+    labels = labels if labels is not None else max(1, modules // 50)
+    license_tiers = license_tiers if license_tiers is not None else max(5, min(500, modules // 5))
+    requirements = requirements if requirements is not None else max(1, min(200, modules // 20))
+    methods = list(ACCESS_METHODS)
+
+    config = [('AuM Multiplier', key, value) for key, value in AUM_BRACKETS.items()]
+    config += [('Access Method', key, value) for key, value in ACCESS_METHODS.items()]
+    config += [('Module Discount', count, round(min(0.05 * (count - 1), 0.5), 2)) for count in range(2, 12)]
+    config += [('Contract Discount', key, value) for key, value in CONTRACT_DISCOUNTS.items()]
+    config += [('Exchange Rate', key, value) for key, value in EXCHANGE_RATES.items()]
+    config += [('License Price', 'Rule', 'tier')]
+    _write(os.path.join(directory, 'config.csv'), ['Type', 'Key', 'Value'], config)
+
+    combos = [combo for size in range(1, len(methods) + 1) for combo in combinations(range(len(methods)), size)]
+    _write(os.path.join(directory, 'accessmethods.csv'), methods + ['Price Factor'], [
+        [str(i in combo).upper() for i in range(len(methods))] + [round(0.1 * (len(combo) - 1), 2)]
+        for combo in combos
+    ])
+
+    names = [f"Module {i:06d}" for i in range(modules - labels)] + [f"Label {i:05d}" for i in range(labels)]
+    topics = [TOPICS[i % len(TOPICS)] for i in range(modules - labels)] + ['Labels'] * labels
+    _write(os.path.join(directory, 'modules.csv'), ['Topic', 'Product module', 'Price'] + methods, [
+        [topic, name, rng.randrange(5000, 70000, 500)] + [rng.random() < 0.8 for _ in methods]
+        for topic, name in zip(topics, names)
+    ])
+
+    tickets = sorted(rng.sample(range(5000, 5000 + 1000 * license_tiers * 4, 1000), license_tiers))
+    _write(os.path.join(directory, 'licenses.csv'), ['Ticket size', '# licenses'], [
+        [ticket, 1 + i * 20 // license_tiers] for i, ticket in enumerate(tickets)
+    ])
+
+    required = names[:min(requirements, modules - labels)] or names[:1]
+    _write(os.path.join(directory, 'labels.csv'), ['Label name'] + required, [
+        [name] + [rng.choice((1, 3, 8)) if rng.random() < 0.2 else 0 for _ in required]
+        for name in names[modules - labels:]
+    ])
+
+    vendors = [f"Vendor {i}" for i in range(10)]
+    _write(os.path.join(directory, 'variablecost.csv'),
+           ['Product module'] + methods + ['Vendor'] + list(AUM_BRACKETS), [
+               [name] + [rng.random() < 0.5 for _ in methods] + [rng.choice(vendors)]
+               + [rng.randrange(0, 2000) for _ in AUM_BRACKETS]
+               for name in rng.sample(names, max(1, modules // 5))
+           ])
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _percentile(times, q):
+    return float(np.percentile(times, q))
+
+
+@contextmanager
+def _cwd(directory):
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def bench_engine(directory, quotes=2000, batch=100000, seed=0):
+    results = {}
+    results['compile_tables_ms'] = min(_timed(lambda: compile_snapshot(directory), 3)) * 1000
+    load_snapshot(directory, persist=True)
+    results['load_snapshot_ms'] = min(_timed(lambda: load_snapshot(directory), 5)) * 1000
+    snapshot = load_snapshot(directory)
+    results['build_engine_ms'] = min(_timed(lambda: QuoteEngine.from_snapshot(snapshot), 3)) * 1000
+    engine = QuoteEngine.from_snapshot(snapshot)
+
+    specs = [parse_spec(record) for record in random_specs(engine, quotes, seed)]
+    times = [t for spec in specs for t in _timed(lambda: engine.quote(spec), 1)]
+    results['quote_p50_us'] = _percentile(times, 50) * 1e6
+    results['quote_p99_us'] = _percentile(times, 99) * 1e6
+
+    batch_specs = [parse_spec(record) for record in random_specs(engine, batch, seed + 1)]
+    elapsed = min(_timed(lambda: engine.quote_batch(batch_specs), 3))
+    results['batch_quotes_per_s'] = batch / elapsed
+
+    # Label checks on selections that always include a label
+    rng = random.Random(seed)
+    label_ids = engine.labels.label_module_ids.tolist()
+    selections = [engine.module_ids_for(spec.modules + (engine.module_names[rng.choice(label_ids)],))
+                  for spec in specs] if label_ids else [engine.module_ids_for(spec.modules) for spec in specs]
+    times = [t for ids in selections for t in _timed(lambda: engine.labels.missing(ids, engine.module_names), 1)]
+    results['label_check_p50_us'] = _percentile(times, 50) * 1e6
+
+    quoted = [engine.quote(spec) for spec in specs]
+    def variable_costs(spec, quote):
+        ids = engine.module_ids_for(spec.modules)
+        engine.line_variable_costs(ids, engine.aum_index[spec.aum],
+                                   engine.selected_methods(engine.access_mask(spec.access_methods)))
+        engine.variable_costs_by_vendor(quote)
+    times = [t for spec, quote in zip(specs, quoted) for t in _timed(lambda: variable_costs(spec, quote), 1)]
+    results['variable_costs_p50_us'] = _percentile(times, 50) * 1e6
+
+    # A comparison of 12 variants differing in contract length and AE discount, priced from
+    # scratch and then after changing one variant
+    base = engine.canonical_spec(specs[0])
+    variants = [replace(base, contract_length=contract, ae_discount=ae)
+                for contract in engine.contract_discounts for ae in (0.0, 0.05, 0.1, 0.15)][:12]
+    def compare_variants(changed):
+        workspace = QuoteWorkspace()
+        for i, variant in enumerate(variants):
+            workspace.save(i, variant)
+        workspace.price(engine, snapshot.version)
+        if changed:
+            workspace.save(0, replace(variants[0], extra_licenses=1))
+            start = time.perf_counter()
+            workspace.price(engine, snapshot.version)
+            return time.perf_counter() - start
+    results['compare_variants_us'] = statistics.median(_timed(lambda: compare_variants(False), 50)) * 1e6
+    results['compare_one_change_us'] = statistics.median([compare_variants(True) for _ in range(50)]) * 1e6
+    return results
+
+
+def bench_reruns(directory, reruns=5, selected=8, seed=0):
+    """Full script runs of app.py against the tables in `directory`, driven by AppTest."""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    engine = QuoteEngine.from_snapshot(load_snapshot(directory))
+    rng = random.Random(seed)
+    modules = rng.sample(engine.module_names, min(selected, len(engine.module_names)))
+
+    results = {}
+    with _cwd(directory):
+        # Caches are per process, so start each catalog from a cold cache
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        at = AppTest.from_file(script, default_timeout=600)
+        results['first_run_ms'] = _timed(at.run, 1)[0] * 1000
+        if at.exception:
+            raise RuntimeError(f"app.py failed: {at.exception[0].message}")
+        at.session_state['selected_modules'] = dict.fromkeys(modules)
+        at.session_state['access_method_API'] = True
+        times = _timed(at.run, reruns)
+        if at.exception:
+            raise RuntimeError(f"app.py failed: {at.exception[0].message}")
+        results['rerun_p50_ms'] = statistics.median(times) * 1000
+        results['rerun_max_ms'] = max(times) * 1000
+    return results
+
+
+def run(scales, quotes=2000, batch=100000, reruns=5, app=True, seed=0, log=sys.stderr):
+    results = {}
+    for modules in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_tables(directory, modules, seed=seed)
+            print(f"{modules} modules: pricing...", file=log)
+            scale = bench_engine(directory, quotes, batch, seed)
+            if app:
+                print(f"{modules} modules: app reruns...", file=log)
+                scale.update(bench_reruns(directory, reruns, seed=seed))
+            results[str(modules)] = scale
+    return {
+        'meta': {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'quotes': quotes,
+            'batch': batch,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.1, out=sys.stdout):
+    """Print every metric against the baseline; returns the regressed (scale, metric) pairs."""
+    regressions = []
+    print(f"{'scale':>8}  {'metric':<24}{'baseline':>14}{'current':>14}{'change':>10}", file=out)
+    for scale, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            base = baseline.get('results', {}).get(scale, {}).get(metric)
+            if base is None or not base:
+                print(f"{scale:>8}  {metric:<24}{'-':>14}{value:>14.2f}{'new':>10}", file=out)
+                continue
+            change = value / base - 1
+            worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+            flag = '  REGRESSION' if worse > threshold else ''
+            if flag:
+                regressions.append((scale, metric))
+            print(f"{scale:>8}  {metric:<24}{base:>14.2f}{value:>14.2f}{change:>+10.1%}{flag}", file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark quoting and app reruns on synthetic pricing tables.")
+    parser.add_argument('--scales', default='10,1000,10000', help="Comma-separated module counts")
+    parser.add_argument('-o', '--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument('--quotes', type=int, default=2000, help="Single quotes timed per scale")
+    parser.add_argument('--batch', type=int, default=100000, help="Quotes per batch")
+    parser.add_argument('--reruns', type=int, default=5, help="App reruns timed per scale")
+    parser.add_argument('--no-app', action='store_true', help="Skip the Streamlit rerun benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    current = run(scales, args.quotes, args.batch, args.reruns, not args.no_app, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
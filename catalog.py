@@ -0,0 +1,114 @@
+import numpy as np
+
+GRAM = 3
+
+
+def _mask(ids, size):
+    bits = np.zeros(size, dtype=bool)
+    bits[np.asarray(ids, dtype=np.intp)] = True
+    return int.from_bytes(np.packbits(bits, bitorder='little').tobytes(), 'little')
+
+
+def _ids(mask, size):
+    data = np.frombuffer(mask.to_bytes(-(-size // 8), 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder='little')[:size])
+
+
+class CatalogIndex:
+    """Search and filter index over the product modules offered in the picker.
+
+    Module sets are int bitmasks over engine module ids, as in LabelIndex, so
+    filters combine with & and |. A search matches modules whose name or topic
+    contains every word of the query; a trigram index narrows the candidates
+    before the substring check, so searching costs the number of matches
+    rather than the catalog size.
+    """
+
+    def __init__(self, names, topics, availability, topic_order, labels=()):
+        size = len(names)
+        self.size = size
+        self.names = tuple(names)
+        self.topics = tuple(topics)
+        self.keys = tuple(f"{name} {topic}".lower() for name, topic in zip(self.names, self.topics))
+
+        position = {topic: i for i, topic in enumerate(topic_order)}
+        offered = [i for i, topic in enumerate(self.topics) if topic in position]
+        self.topic_order = tuple(topic for topic in topic_order if topic in set(self.topics))
+        self.topic_masks = {topic: _mask([i for i in offered if self.topics[i] == topic], size)
+                            for topic in self.topic_order}
+        self.offered = _mask(offered, size)
+        # Display order: by topic, then catalog order
+        self.rank = np.full(size, size, dtype=np.intp)
+        order = np.array(sorted(offered, key=lambda i: position[self.topics[i]]), dtype=np.intp)
+        self.rank[order] = np.arange(len(offered))
+
+        # Offered modules that can be required on their own, i.e. are not labels
+        self.labels = _mask(labels, size)
+        self.unlabelled = self.offered & ~self.labels
+        # The unfiltered lists are shown on most reruns, so they are ordered once
+        self._ordered = {self.offered: order, self.unlabelled: order[~np.isin(order, labels)]}
+
+        # Modules available through each access method
+        availability = np.asarray(availability, dtype=bool).reshape(size, -1)
+        self.method_masks = tuple(_mask(np.flatnonzero(column), size) for column in availability.T)
+
+        postings = {}
+        for i in offered:
+            key = self.keys[i]
+            for gram in {key[j:j + GRAM] for j in range(len(key) - GRAM + 1)}:
+                postings.setdefault(gram, []).append(i)
+        self.grams = {gram: _mask(ids, size) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_engine(cls, engine, topic_order):
+        return cls(engine.module_names, engine.topics, engine.availability, topic_order,
+                   engine.labels.label_module_ids)
+
+    def search(self, query):
+        """Bitmask of offered modules matching every word of `query`."""
+        mask = self.offered
+        for word in query.lower().split():
+            if len(word) >= GRAM:
+                for j in range(len(word) - GRAM + 1):
+                    mask &= self.grams.get(word[j:j + GRAM], 0)
+            # Trigrams only narrow the candidates; the substring check decides
+            mask = _mask([i for i in _ids(mask, self.size) if word in self.keys[i]], self.size)
+            if not mask:
+                break
+        return mask
+
+    def available(self, access_mask):
+        """Bitmask of modules available through at least one method in `access_mask`."""
+        mask = 0
+        for method, method_mask in enumerate(self.method_masks):
+            if access_mask >> method & 1:
+                mask |= method_mask
+        return mask
+
+    def filter(self, query='', topics=(), access_mask=0):
+        mask = self.search(query) if query.strip() else self.offered
+        if topics:
+            topic_mask = 0
+            for topic in topics:
+                topic_mask |= self.topic_masks.get(topic, 0)
+            mask &= topic_mask
+        if access_mask:
+            mask &= self.available(access_mask)
+        return mask
+
+    def ids(self, mask):
+        """Module ids in `mask`, in display order."""
+        if mask in self._ordered:
+            return self._ordered[mask]
+        ids = _ids(mask, self.size)
+        return ids[np.argsort(self.rank[ids], kind='stable')]
+
+    def grouped(self, ids):
+        """[(topic, [module names])] for module ids in display order."""
+        groups = []
+        for i in ids.tolist():
+            topic = self.topics[i]
+            if not groups or groups[-1][0] != topic:
+                groups.append((topic, []))
+            groups[-1][1].append(self.names[i])
+        return groups
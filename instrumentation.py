@@ -0,0 +1,70 @@
+import json
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start', 'blocks')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.profiler.add(self.name, elapsed, sys.getallocatedblocks() - self.blocks)
+
+
+class RerunProfiler:
+    """Wall time and allocation counts per phase of one configurator rerun.
+
+    Allocations are the net change in live interpreter memory blocks over a
+    phase. Phases can repeat (their totals accumulate) and nest (an outer
+    phase includes its inner ones). A disabled profiler hands out a shared
+    no-op context, so instrumented code costs one call per phase.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name, seconds, blocks):
+        totals = self.phases.setdefault(name, [0.0, 0, 0])
+        totals[0] += seconds
+        totals[1] += blocks
+        totals[2] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rows(self):
+        """(phase, milliseconds, allocated blocks, calls) in the order phases first ran."""
+        return [(name, seconds * 1000, blocks, calls) for name, (seconds, blocks, calls) in self.phases.items()]
+
+    def append_jsonl(self, path, **extra):
+        record = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'total_ms': self.elapsed() * 1000,
+            'phases': {name: {'ms': ms, 'blocks': blocks, 'calls': calls}
+                       for name, ms, blocks, calls in self.rows()},
+            **extra,
+        }
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+NULL_PROFILER = RerunProfiler(enabled=False)
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+class LabelIndex:
+    """Label requirements compiled into module bitmasks.
+
+    Each column of labels.csv holds the number of metrics a label needs from
+    one product module; `requirements` maps the column to that module
+    (column name -> module name). A label whose column count is above zero
+    requires the module, so checking a selection is a mask-and-compare per
+    selected label; batches are checked with unmet_counts().
+    """
+
+    def __init__(self, labels, requirements, module_ids):
+        module_count = len(module_ids)
+        names = tuple(labels['Label name']) if 'Label name' in labels else ()
+        columns = [column for column in requirements if column in labels]
+        self.labels = tuple(name for name in names if name in module_ids)
+        self.label_module_ids = np.array([module_ids[name] for name in self.labels], dtype=np.intp)
+        positions = {name: row for row, name in enumerate(names)}
+        rows = [positions[name] for name in self.labels]
+
+        # Metric counts per (label, required module), in column order
+        self.requirements = []
+        for row in rows:
+            required = {}
+            for column in columns:
+                count = int(labels[column][row])
+                if count > 0:
+                    module_id = module_ids[requirements[column]]
+                    required[module_id] = required.get(module_id, 0) + count
+            self.requirements.append(required)
+
+        self.required_masks = [sum(1 << module_id for module_id in required) for required in self.requirements]
+        self.label_bits = {1 << int(module_id): i for i, module_id in enumerate(self.label_module_ids)}
+        self.label_mask = sum(self.label_bits)
+
+        # Sparse form for batches: label index per module id (-1 if not a label), and the
+        # required module ids of every label concatenated, with offsets
+        self.label_positions = np.full(module_count, -1, dtype=np.intp)
+        self.label_positions[self.label_module_ids] = np.arange(len(self.labels))
+        self.required_counts = np.array([len(required) for required in self.requirements], dtype=np.intp)
+        self.required_offsets = np.concatenate(([0], np.cumsum(self.required_counts)[:-1])).astype(np.intp)
+        self.required_ids = np.array([module_id for required in self.requirements for module_id in required],
+                                     dtype=np.intp)
+        self.module_count = module_count
+
+    @staticmethod
+    def selection_mask(module_ids):
+        return sum(1 << int(module_id) for module_id in set(module_ids))
+
+    def missing(self, module_ids, module_names):
+        """Unmet requirements of the selected labels: label -> [(module, metric count)]."""
+        selected = self.selection_mask(module_ids)
+        labels = selected & self.label_mask
+        missing = {}
+        while labels:
+            bit = labels & -labels
+            labels ^= bit
+            label = self.label_bits[bit]
+            unmet = self.required_masks[label] & ~selected
+            if unmet:
+                missing[self.labels[label]] = [(module_names[module_id], count)
+                                               for module_id, count in self.requirements[label].items()
+                                               if unmet >> module_id & 1]
+        return missing
+
+    def unmet_counts(self, rows, module_ids, selection_count):
+        """Number of selected labels with unmet requirements per selection, for selections given
+        as (selection row, module id) lines with no repeated module within a selection.
+
+        Only the labels actually selected are checked: their required ids are looked up among the
+        sorted (row, module id) keys of the selection lines, so the cost follows the number of
+        lines and required modules rather than selections x catalog size.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        module_ids = np.asarray(module_ids, dtype=np.int64)
+        labels = self.label_positions[module_ids] if len(module_ids) else np.zeros(0, dtype=np.intp)
+        is_label = labels >= 0
+        label_rows, labels = rows[is_label], labels[is_label]
+        counts = self.required_counts[labels]
+        if not counts.sum():
+            return np.zeros(selection_count, dtype=int)
+
+        # Every (selected label, required module) pair, flattened
+        owners = np.repeat(np.arange(len(labels)), counts)
+        starts = np.repeat(self.required_offsets[labels] - np.cumsum(counts) + counts, counts)
+        required = self.required_ids[starts + np.arange(len(owners))]
+
+        keys = np.sort(rows * self.module_count + module_ids)
+        wanted = label_rows[owners] * self.module_count + required
+        found = keys[np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)] == wanted
+        unmet = np.bincount(owners, weights=~found, minlength=len(labels)) > 0
+        return np.bincount(label_rows[unmet], minlength=selection_count)
@@ -0,0 +1,113 @@
+from dataclasses import dataclass, replace
+from functools import reduce
+
+import numpy as np
+
+# Amounts are stored in minor currency units (cents); all quote currencies have two decimals
+MINOR_UNITS = 100
+CURRENCY_SYMBOLS = {'EUR': '€', 'USD': '$', 'GBP': '£'}
+# Thousands groups needed for the largest int64 amount
+_GROUPS = 6
+
+
+def _whole(minor):
+    return np.rint(minor).astype(np.int64)
+
+
+def to_minor(amounts):
+    """Round amounts to whole minor units, halves to even (as np.rint)."""
+    return _whole(np.asarray(amounts, dtype=float) * MINOR_UNITS)
+
+
+def discount_lines(list_price, bundle_discount, multi_year_discount, ae_discount):
+    """Bundle, multi-year and AE discounts and the final price of minor-unit list prices, rounded
+    as in QuoteLedger. The rates broadcast against the prices, so many quotes price at once."""
+    bundle = _whole(list_price * bundle_discount)
+    remaining = list_price - bundle
+    multi_year = _whole(remaining * multi_year_discount)
+    remaining = remaining - multi_year
+    ae = _whole(remaining * ae_discount)
+    return bundle, multi_year, ae, remaining - ae
+
+
+def format_amounts(amounts, currency):
+    """Format minor-unit amounts as currency strings ('£1,234.56') in one array pass."""
+    amounts = np.asarray(amounts, dtype=np.int64)
+    units, cents = np.divmod(np.abs(amounts), MINOR_UNITS)
+    groups = [np.char.zfill((units // 1000 ** i % 1000).astype(str), 3) for i in reversed(range(_GROUPS))]
+    digits = np.char.lstrip(reduce(lambda a, b: np.char.add(np.char.add(a, ','), b), groups), '0,')
+    digits = np.where(digits == '', '0', digits)
+    symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} ")
+    prefix = np.where(amounts < 0, f"-{symbol}", symbol)
+    return np.char.add(np.char.add(prefix, digits), np.char.add('.', np.char.zfill(cents.astype(str), 2)))
+
+
+def format_amount(amount, currency):
+    return str(format_amounts(amount, currency))
+
+
+@dataclass(frozen=True, eq=False)
+class QuoteLedger:
+    """A quote in integer minor currency units, one array entry per line.
+
+    Rounding is done once per line and step, so every figure is exact and
+    the ledger always reconciles:
+      - list_price is the line's list price rounded to the minor unit;
+      - each discount is the rounded discount on the amount left after the
+        previous one (bundle, then multi-year, then AE);
+      - final_price is list_price minus the three discounts;
+      - the total is the sum of final prices, never a rounded float total.
+    Additional licenses are the license price, rounded, times their number.
+    """
+    currency: str
+    list_price: np.ndarray
+    bundle_discount: np.ndarray
+    multi_year_discount: np.ndarray
+    ae_discount: np.ndarray
+    final_price: np.ndarray
+    variable_cost: np.ndarray
+    license_price: int
+    extra_licenses: int
+
+    @classmethod
+    def from_lines(cls, currency, list_prices, bundle_discount, multi_year_discount, ae_discount, variable_costs,
+                   license_price, extra_licenses=0):
+        """Ledger for per-line list prices and variable costs (floats, in `currency`) and discount rates."""
+        list_price = to_minor(list_prices)
+        bundle, multi_year, ae, final_price = discount_lines(list_price, bundle_discount, multi_year_discount,
+                                                             ae_discount)
+        return cls(
+            currency=currency,
+            list_price=list_price,
+            bundle_discount=bundle,
+            multi_year_discount=multi_year,
+            ae_discount=ae,
+            final_price=final_price,
+            variable_cost=to_minor(variable_costs),
+            license_price=int(to_minor(license_price)),
+            extra_licenses=int(extra_licenses),
+        )
+
+    def with_extra_licenses(self, extra_licenses):
+        return replace(self, extra_licenses=int(extra_licenses))
+
+    @property
+    def total(self):
+        return int(self.final_price.sum())
+
+    @property
+    def extra_license_cost(self):
+        return self.extra_licenses * self.license_price
+
+    @property
+    def final_total(self):
+        return self.total + self.extra_license_cost
+
+    @property
+    def variable_total(self):
+        return int(self.variable_cost.sum())
+
+    def formatted(self, *columns):
+        """Formatted strings for the given line columns, e.g. formatted('list_price', 'final_price')."""
+        amounts = np.stack([getattr(self, column) for column in columns])
+        return dict(zip(columns, format_amounts(amounts, self.currency)))
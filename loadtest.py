@@ -0,0 +1,117 @@
+"""Load test for the quote service: latency percentiles and throughput.
+
+    python service.py --port 8080 &
+    python loadtest.py --port 8080 --requests 20000 --concurrency 64
+    python loadtest.py --endpoint quotes --batch-size 100
+
+Random valid specs are drawn from the local pricing tables. Each of
+`concurrency` workers keeps one keep-alive connection and sends requests
+back to back.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from pricing import load_engine
+
+
+def random_specs(engine, count, seed=0):
+    rng = random.Random(seed)
+    currencies = list(engine.exchange_rates)
+    brackets = list(engine.aum_brackets)
+    contracts = list(engine.contract_discounts)
+    methods = list(engine.access_methods)
+    modules = list(engine.module_names)
+    for _ in range(count):
+        yield {
+            'currency': rng.choice(currencies),
+            'aum': rng.choice(brackets),
+            'contract_length': rng.choice(contracts),
+            'access_methods': rng.sample(methods, rng.randint(1, len(methods))),
+            'modules': rng.sample(modules, rng.randint(1, min(8, len(modules)))),
+            'ae_discount': rng.choice((0, 0.05, 0.1, 0.15)),
+            'extra_licenses': rng.randint(0, 3),
+        }
+
+
+async def request(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split(' ')[1])
+
+
+async def worker(host, port, path, payloads, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port, limit=64 * 1024 * 1024)
+    try:
+        for payload in payloads:
+            start = time.perf_counter()
+            status = await request(reader, writer, host, path, payload)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, endpoint, payloads, concurrency):
+    path = {'quote': '/quote', 'quotes': '/quotes', 'labels': '/labels/check'}[endpoint]
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, path, payloads[i::concurrency], latencies, statuses) for i in range(concurrency)
+    ))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def report(elapsed, latencies, statuses, quotes_per_request, out=sys.stdout):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    requests = len(latencies)
+    print(f"Requests:    {requests} in {elapsed:.2f}s", file=out)
+    print(f"Throughput:  {requests / elapsed:,.0f} requests/s ({requests * quotes_per_request / elapsed:,.0f} quotes/s)", file=out)
+    print(f"Latency:     p50 {cuts[49] * 1000:.2f} ms, p99 {cuts[98] * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms", file=out)
+    print(f"Status:      {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items()))}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a local quote service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--endpoint', choices=['quote', 'quotes', 'labels'], default='quote')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument('--batch-size', type=int, default=100, help="Specs per request for --endpoint quotes")
+    parser.add_argument('--tables', default='.', help="Directory containing the pricing CSVs")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    engine = load_engine(args.tables)
+    if args.endpoint == 'quotes':
+        specs = list(random_specs(engine, args.requests * args.batch_size, args.seed))
+        payloads = [{'quotes': specs[i:i + args.batch_size]} for i in range(0, len(specs), args.batch_size)]
+    elif args.endpoint == 'labels':
+        payloads = [{'modules': spec['modules']} for spec in random_specs(engine, args.requests, args.seed)]
+    else:
+        payloads = list(random_specs(engine, args.requests, args.seed))
+
+    concurrency = max(1, min(args.concurrency, len(payloads)))
+    elapsed, latencies, statuses = asyncio.run(run(args.host, args.port, args.endpoint, payloads, concurrency))
+    report(elapsed, latencies, statuses, args.batch_size if args.endpoint == 'quotes' else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,490 @@
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from instrumentation import NULL_PROFILER
+from labels import LabelIndex
+from ledger import MINOR_UNITS, QuoteLedger, discount_lines, to_minor
+from snapshot import LICENSE_RULES, load_snapshot
+
+# Access methods in the column order used by accessmethods.csv
+ACCESS_METHODS = ('Webapp (reports only)', 'Webapp (download)', 'API', 'Datafeed')
+
+
+@dataclass(frozen=True)
+class QuoteSpec:
+    """A single price request, as entered in the configurator."""
+    currency: str
+    aum: str
+    contract_length: str
+    access_methods: tuple = ()
+    modules: tuple = ()
+    ae_discount: float = 0.0
+    extra_licenses: int = 0
+
+
+@dataclass(frozen=True, eq=False)
+class QuoteResult:
+    """Numeric result of pricing a QuoteSpec. Per-line arrays follow `modules`.
+
+    The float fields are unrounded; `ledger` holds the same quote in whole
+    minor currency units and is what gets shown and invoiced.
+    """
+    spec: QuoteSpec
+    module_ids: np.ndarray
+    modules: tuple
+    topics: tuple
+    list_prices: np.ndarray
+    final_prices: np.ndarray
+    variable_costs: np.ndarray
+    exchange_rate: float
+    access_factor: float
+    bundle_discount: float
+    multi_year_discount: float
+    ae_discount: float
+    total_price: float
+    included_licenses: int
+    license_price: float
+    extra_license_cost: float
+    final_total_price: float
+    incompatible: tuple
+    missing_requirements: dict
+    ledger: QuoteLedger
+
+
+@dataclass(frozen=True, eq=False)
+class BatchResult:
+    """Per-quote totals for a batch of QuoteSpecs, one array entry per spec.
+
+    The line_* arrays have one entry per selected module across the batch:
+    the quote row, the module id and the line's final price. The *_minor
+    fields are the quote ledger's amounts in minor currency units (see
+    ledger.QuoteLedger), which is what a quote shows and invoices.
+    """
+    list_price: np.ndarray
+    bundle_discount: np.ndarray
+    multi_year_discount: np.ndarray
+    total_price: np.ndarray
+    included_licenses: np.ndarray
+    license_price: np.ndarray
+    extra_license_cost: np.ndarray
+    final_total_price: np.ndarray
+    variable_cost: np.ndarray
+    incompatible: np.ndarray
+    missing_labels: np.ndarray
+    line_rows: np.ndarray
+    line_module_ids: np.ndarray
+    line_final_minor: np.ndarray
+    total_minor: np.ndarray
+    final_total_minor: np.ndarray
+
+
+@dataclass(frozen=True, eq=False)
+class PriceCube:
+    """Final totals of one module and access method selection for every
+    currency x AuM bracket x contract length x AE discount, in minor currency
+    units and rounded per line as in the quote ledger."""
+    currencies: tuple
+    aum_brackets: tuple
+    contract_lengths: tuple
+    ae_discounts: tuple
+    totals: np.ndarray
+
+    def matrix(self, currency, ae_discount):
+        """(AuM bracket x contract length) slice for one currency and AE discount."""
+        return self.totals[self.currencies.index(currency), :, :, self.ae_discounts.index(ae_discount)]
+
+
+class LicenseIndex:
+    """License tiers sorted by ticket size, looked up by binary search.
+
+    A quote's tier is the first one whose ticket size covers its total; totals
+    above the largest tier fall into the largest. Lookups accept a single
+    total or an array of totals.
+
+    The price of one additional license follows `rule`:
+      'floor' - the ticket size of the first tier at or above `floor`
+      'tier'  - the ticket size of the quote's tier divided by its licenses
+    """
+    RULES = LICENSE_RULES
+
+    def __init__(self, ticket_sizes, license_counts, rule='floor', floor=5000):
+        if rule not in self.RULES:
+            raise ValueError(f"Unknown license pricing rule: {rule}")
+        ticket_sizes = np.asarray(ticket_sizes, dtype=float)
+        order = np.argsort(ticket_sizes, kind='stable')
+        self.ticket_sizes = ticket_sizes[order]
+        self.license_counts = np.asarray(license_counts, dtype=int)[order]
+        self.rule = rule
+        self.floor = floor
+        if not self.ticket_sizes.size:
+            self.tier_prices = np.zeros(0)
+        elif rule == 'tier':
+            self.tier_prices = self.ticket_sizes / np.maximum(self.license_counts, 1)
+        else:
+            at_floor = min(np.searchsorted(self.ticket_sizes, floor), len(self.ticket_sizes) - 1)
+            self.tier_prices = np.full(len(self.ticket_sizes), self.ticket_sizes[at_floor])
+
+    @classmethod
+    def from_table(cls, licenses, rule='floor', floor=5000):
+        return cls(licenses['Ticket size'], licenses['# licenses'], rule, floor)
+
+    def tiers(self, totals):
+        return np.minimum(np.searchsorted(self.ticket_sizes, totals, side='left'),
+                          len(self.ticket_sizes) - 1)
+
+    def included(self, totals):
+        if not self.ticket_sizes.size:
+            return np.ones(np.shape(totals), dtype=int) if np.ndim(totals) else 1
+        counts = self.license_counts[self.tiers(totals)]
+        return counts if np.ndim(totals) else int(counts)
+
+    def price(self, totals):
+        if not self.ticket_sizes.size:
+            return np.ones(np.shape(totals)) if np.ndim(totals) else 1.0
+        prices = self.tier_prices[self.tiers(totals)]
+        return prices if np.ndim(totals) else float(prices)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _lookup(table, key, what):
+    try:
+        return table[key]
+    except KeyError:
+        raise ValueError(f"Unknown {what}: {key}") from None
+
+
+class QuoteEngine:
+    """Prices quotes from the loaded pricing tables.
+
+    Everything that does not depend on the quote is precomputed once: module
+    prices and availability are arrays indexed by module id, bundle discounts
+    are indexed by module count and access method factors by selection bitmask.
+
+    Tables are column mappings (column name -> values) as stored in a
+    PricingSnapshot; DataFrames work as well.
+    """
+
+    def __init__(self, modules, aum_brackets, exchange_rates, module_discounts,
+                 contract_discounts, access_method_factors, licenses, variable_costs,
+                 access_methods=ACCESS_METHODS, license_rule='floor', license_floor=5000,
+                 labels=None, label_requirements=None):
+        self.aum_brackets = dict(aum_brackets)
+        self.exchange_rates = dict(exchange_rates)
+        self.module_discounts = dict(module_discounts)
+        self.contract_discounts = dict(contract_discounts)
+        self.access_methods = tuple(access_methods)
+        self.access_method_index = {method: i for i, method in enumerate(self.access_methods)}
+
+        # Quote parameters, indexed by their position in the config tables
+        self.aum_index = {aum: i for i, aum in enumerate(self.aum_brackets)}
+        self.aum_multipliers = np.array(list(self.aum_brackets.values()), dtype=float)
+        self.currency_index = {currency: i for i, currency in enumerate(self.exchange_rates)}
+        self.rates = np.array(list(self.exchange_rates.values()), dtype=float)
+        self.contract_index = {contract: i for i, contract in enumerate(self.contract_discounts)}
+        self.multi_year_discounts = np.array(list(self.contract_discounts.values()), dtype=float) / 100
+
+        # Module catalog, indexed by module id
+        self.module_names = tuple(modules['Product module'])
+        self.module_ids = {name: i for i, name in enumerate(self.module_names)}
+        self.topics = tuple(str(topic) for topic in modules['Topic'])
+        self.prices = np.array([_to_float(price) for price in modules['Price']])
+        self.availability = np.column_stack([
+            np.asarray(modules[method], dtype=object) == True
+            for method in self.access_methods
+        ]) if len(self.module_names) else np.zeros((0, len(self.access_methods)), dtype=bool)
+
+        # Access method factors, indexed by selection bitmask (unknown combinations price at 0)
+        self.access_factors = np.zeros(1 << len(self.access_methods))
+        self.priced_access = np.zeros(len(self.access_factors), dtype=bool)
+        for key, value in access_method_factors.items():
+            mask = sum(1 << i for i, flag in enumerate(key) if flag)
+            self.access_factors[mask] = value
+            self.priced_access[mask] = True
+
+        # Bundle discount by number of selected modules; the contract length only sets the multi-year discount
+        self.bundle_discounts = np.array([self.calculate_discount(count)
+                                          for count in range(len(self.module_names) + 1)])
+
+        # License tiers
+        self.licenses = LicenseIndex.from_table(licenses, license_rule, license_floor)
+        # Most additional licenses whose cost, at the dearest license price, fits in half the int64 minor-unit
+        # range, leaving the other half for the module lines
+        dearest = int(to_minor(self.licenses.tier_prices.max())) if self.licenses.tier_prices.size else MINOR_UNITS
+        self.max_extra_licenses = np.iinfo(np.int64).max // 2 // max(dearest, 1)
+
+        # Label requirements
+        self.labels = LabelIndex(labels or {}, label_requirements or {}, self.module_ids)
+
+        # Variable costs as a dense (module x AuM bracket) matrix, plus the access methods
+        # the vendor charges for and the vendor of each module. Rows of the variable cost
+        # table for modules outside the catalog are ignored; the first row per module wins.
+        self.variable_cost_matrix = np.zeros((len(self.module_names), len(self.aum_brackets)))
+        self.variable_cost_access = np.zeros((len(self.module_names), len(self.access_methods)), dtype=bool)
+        self.module_vendors = np.full(len(self.module_names), -1, dtype=np.intp)
+        vendor_ids = {}
+        for row, module in enumerate(variable_costs['Product module']):
+            module_id = self.module_ids.get(module)
+            if module_id is None or self.module_vendors[module_id] >= 0:
+                continue
+            self.variable_cost_matrix[module_id] = [_to_float(variable_costs[aum][row]) for aum in self.aum_brackets]
+            self.variable_cost_access[module_id] = [variable_costs[method][row] == True
+                                                    for method in self.access_methods]
+            self.module_vendors[module_id] = vendor_ids.setdefault(variable_costs['Vendor'][row], len(vendor_ids))
+        self.vendors = tuple(vendor_ids)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(
+            modules=snapshot.modules,
+            aum_brackets=snapshot.aum_brackets,
+            exchange_rates=snapshot.exchange_rates,
+            module_discounts=snapshot.module_discounts,
+            contract_discounts=snapshot.contract_discounts,
+            access_method_factors=snapshot.access_method_factors,
+            licenses=snapshot.licenses,
+            variable_costs=snapshot.variable_costs,
+            license_rule=snapshot.license_pricing.get('Rule', 'floor'),
+            license_floor=float(snapshot.license_pricing.get('Floor', 5000)),
+            labels=snapshot.labels,
+            label_requirements=snapshot.label_requirements,
+        )
+
+    def calculate_discount(self, module_count):
+        """Bundle discount for `module_count` modules; counts above the table get its largest row."""
+        largest = max(self.module_discounts) if self.module_discounts else 0
+        return self.module_discounts.get(module_count, self.module_discounts[largest] if module_count > largest else 0)
+
+    def module_ids_for(self, modules):
+        return np.array([_lookup(self.module_ids, name, 'product module')
+                         for name in dict.fromkeys(modules)], dtype=np.intp)
+
+    def access_mask(self, access_methods):
+        return sum(1 << _lookup(self.access_method_index, method, 'access method')
+                   for method in set(access_methods))
+
+    def selected_methods(self, access_masks):
+        """Expand access method bitmasks into a boolean (..., method) array."""
+        return (np.asarray(access_masks)[..., None] & (1 << np.arange(len(self.access_methods)))) != 0
+
+    def line_variable_costs(self, ids, aum, selected):
+        """Variable cost per line before currency conversion: a gather from the cost
+        matrix, masked to lines whose vendor charges for a selected access method."""
+        charged = (self.variable_cost_access[ids] & selected).any(axis=-1)
+        return self.variable_cost_matrix[ids, aum] * charged
+
+    def variable_costs_by_vendor(self, result):
+        """Total variable cost of a quote per vendor, in minor units of the quote currency
+        (sums of the ledger lines, so they add up to the ledger's variable total)."""
+        vendors = self.module_vendors[result.module_ids]
+        totals = np.zeros(len(self.vendors), dtype=np.int64)
+        np.add.at(totals, vendors[vendors >= 0], result.ledger.variable_cost[vendors >= 0])
+        return {vendor: int(total) for vendor, total in zip(self.vendors, totals)}
+
+    def canonical_spec(self, spec):
+        """Equivalent spec with modules in catalog order and access methods in factor table
+        order, so that equal configurations compare and hash equal."""
+        ids = np.unique(self.module_ids_for(spec.modules))
+        selected = self.selected_methods(self.access_mask(spec.access_methods))
+        return QuoteSpec(
+            currency=spec.currency,
+            aum=spec.aum,
+            contract_length=spec.contract_length,
+            access_methods=tuple(method for method, on in zip(self.access_methods, selected) if on),
+            modules=tuple(self.module_names[i] for i in ids),
+            ae_discount=float(spec.ae_discount),
+            extra_licenses=int(spec.extra_licenses),
+        )
+
+    def check_spec(self, spec):
+        """Raise ValueError if the spec refers to anything not in the pricing tables, or its
+        AE discount or number of additional licenses is out of range."""
+        if not 0 <= spec.ae_discount < 1:
+            raise ValueError(f"ae_discount must be at least 0 and below 1: {spec.ae_discount}")
+        if not 0 <= spec.extra_licenses <= self.max_extra_licenses:
+            raise ValueError(f"extra_licenses must be between 0 and {self.max_extra_licenses}: {spec.extra_licenses}")
+        _lookup(self.aum_index, spec.aum, 'AuM bracket')
+        _lookup(self.currency_index, spec.currency, 'currency')
+        _lookup(self.contract_index, spec.contract_length, 'contract length')
+        self.access_mask(spec.access_methods)
+        self.module_ids_for(spec.modules)
+
+    def quote_batch(self, specs):
+        """Price many specs at once. Module selections are flattened into one
+        array of (quote row, module id) pairs so that work scales with the
+        number of selected lines, not quotes x catalog size."""
+        count = len(specs)
+        aum = np.fromiter((_lookup(self.aum_index, s.aum, 'AuM bracket') for s in specs), np.intp, count)
+        currency = np.fromiter((_lookup(self.currency_index, s.currency, 'currency') for s in specs), np.intp, count)
+        contract = np.fromiter((_lookup(self.contract_index, s.contract_length, 'contract length') for s in specs),
+                               np.intp, count)
+        access = np.fromiter((self.access_mask(s.access_methods) for s in specs), np.intp, count)
+        ae_discount = np.fromiter((s.ae_discount for s in specs), float, count)
+        extra_licenses = np.fromiter((s.extra_licenses for s in specs), float, count)
+        ids = [self.module_ids_for(s.modules) for s in specs]
+        lines = np.fromiter(map(len, ids), np.intp, count)
+        flat = np.concatenate(ids) if count else np.zeros(0, dtype=np.intp)
+        rows = np.repeat(np.arange(count), lines)
+
+        rate = self.rates[currency]
+        line_prices = self.prices[flat]
+        list_price = (np.bincount(rows, weights=line_prices, minlength=count)
+                      * self.aum_multipliers[aum] * rate * (1 + self.access_factors[access]))
+        bundle_discount = self.bundle_discounts[lines]
+        multi_year_discount = self.multi_year_discounts[contract]
+        total_price = list_price * (1 - bundle_discount) * (1 - multi_year_discount) * (1 - ae_discount)
+
+        license_price = self.licenses.price(total_price)
+        extra_license_cost = extra_licenses * license_price
+
+        # Selected access methods as a (quote x method) mask
+        selected = self.selected_methods(access)
+        unavailable = ~self.availability[flat] & selected[rows]
+        incompatible = np.bincount(rows, weights=unavailable.sum(axis=1), minlength=count).astype(int)
+
+        line_costs = self.line_variable_costs(flat, aum[rows], selected[rows])
+        variable_cost = np.bincount(rows, weights=line_costs, minlength=count) * rate
+
+        # Ledger amounts, with the same per-line rounding as a single quote
+        line_list = to_minor(line_prices * self.aum_multipliers[aum][rows] * rate[rows]
+                             * (1 + self.access_factors[access])[rows])
+        line_final = discount_lines(line_list, bundle_discount[rows], multi_year_discount[rows],
+                                    ae_discount[rows])[3]
+        total_minor = np.bincount(rows, weights=line_final, minlength=count).astype(np.int64)
+        extra_license_minor = extra_licenses.astype(np.int64) * to_minor(license_price)
+
+        return BatchResult(
+            list_price=list_price,
+            bundle_discount=bundle_discount,
+            multi_year_discount=multi_year_discount,
+            total_price=total_price,
+            included_licenses=self.licenses.included(total_price),
+            license_price=license_price,
+            extra_license_cost=extra_license_cost,
+            final_total_price=total_price + extra_license_cost,
+            variable_cost=variable_cost,
+            incompatible=incompatible,
+            missing_labels=self.labels.unmet_counts(rows, flat, count),
+            line_rows=rows,
+            line_module_ids=flat,
+            line_final_minor=line_final,
+            total_minor=total_minor,
+            final_total_minor=total_minor + extra_license_minor,
+        )
+
+    def price_cube(self, modules, access_methods=(), ae_discounts=(0.0,), extra_licenses=0):
+        """Price one selection across all currencies, AuM brackets, contract lengths
+        and the given AE discounts in a single broadcast over (cube x line)."""
+        ids = self.module_ids_for(modules)
+        access_factor = float(self.access_factors[self.access_mask(access_methods)])
+        bundle_discount = float(self.bundle_discounts[len(ids)])
+        ae_discounts = tuple(ae_discounts)
+        # Line list prices per (currency, AuM bracket, line), multiplied in the order quote() uses
+        list_prices = (self.prices[ids][None, None, :] * self.aum_multipliers[None, :, None]
+                       * self.rates[:, None, None] * (1 + access_factor))[:, :, None, None, :]
+        multi_year = self.multi_year_discounts[None, None, :, None, None]
+        ae = np.asarray(ae_discounts, dtype=float)[None, None, None, :, None]
+        totals = discount_lines(to_minor(list_prices), bundle_discount, multi_year, ae)[3].sum(axis=-1)
+        if extra_licenses:
+            # License tiers are looked up on the unrounded totals, as in quote()
+            float_totals = (list_prices * (1 - bundle_discount) * (1 - multi_year) * (1 - ae)).sum(axis=-1)
+            totals = totals + extra_licenses * to_minor(self.licenses.price(float_totals))
+        return PriceCube(
+            currencies=tuple(self.exchange_rates),
+            aum_brackets=tuple(self.aum_brackets),
+            contract_lengths=tuple(self.contract_discounts),
+            ae_discounts=ae_discounts,
+            totals=totals,
+        )
+
+    def base_prices(self, currency, aum, access_methods):
+        """List price of every module in the catalog for one currency, AuM bracket and set of
+        access methods; quotes sharing these can pass it to quote() instead of recomputing it."""
+        access_factor = float(self.access_factors[self.access_mask(access_methods)])
+        return (self.prices * _lookup(self.aum_brackets, aum, 'AuM bracket')
+                * _lookup(self.exchange_rates, currency, 'currency') * (1 + access_factor))
+
+    def quote(self, spec, profiler=NULL_PROFILER, base_prices=None):
+        with profiler.phase('price computation'):
+            ids = self.module_ids_for(spec.modules)
+            aum_multiplier = _lookup(self.aum_brackets, spec.aum, 'AuM bracket')
+            exchange_rate = _lookup(self.exchange_rates, spec.currency, 'currency')
+            contract_discount = _lookup(self.contract_discounts, spec.contract_length, 'contract length')
+            access_mask = self.access_mask(spec.access_methods)
+            access_factor = float(self.access_factors[access_mask])
+
+            if base_prices is None:
+                list_prices = self.prices[ids] * aum_multiplier * exchange_rate * (1 + access_factor)
+            else:
+                list_prices = base_prices[ids]
+            bundle_discount = float(self.bundle_discounts[len(ids)])
+            multi_year_discount = contract_discount / 100
+            final_prices = (list_prices * (1 - bundle_discount) * (1 - multi_year_discount)
+                            * (1 - spec.ae_discount))
+            total_price = float(final_prices.sum())
+
+        with profiler.phase('license lookup'):
+            included_licenses = self.licenses.included(total_price)
+            license_price = self.licenses.price(total_price)
+            extra_license_cost = spec.extra_licenses * license_price
+
+        with profiler.phase('incompatibility checks'):
+            selected = self.selected_methods(access_mask)
+            unavailable = ~self.availability[ids] & selected
+            incompatible = tuple((self.module_names[ids[row]], self.access_methods[col])
+                                 for row, col in np.argwhere(unavailable))
+
+        with profiler.phase('variable costs'):
+            variable_costs = self.line_variable_costs(ids, self.aum_index[spec.aum], selected) * exchange_rate
+
+        with profiler.phase('label checks'):
+            missing_requirements = self.labels.missing(ids, self.module_names)
+
+        with profiler.phase('ledger'):
+            ledger = QuoteLedger.from_lines(spec.currency, list_prices, bundle_discount, multi_year_discount,
+                                            spec.ae_discount, variable_costs, license_price, spec.extra_licenses)
+
+        return QuoteResult(
+            spec=spec,
+            module_ids=ids,
+            modules=tuple(self.module_names[i] for i in ids),
+            topics=tuple(self.topics[i] for i in ids),
+            list_prices=list_prices,
+            final_prices=final_prices,
+            variable_costs=variable_costs,
+            exchange_rate=exchange_rate,
+            access_factor=access_factor,
+            bundle_discount=bundle_discount,
+            multi_year_discount=multi_year_discount,
+            ae_discount=spec.ae_discount,
+            total_price=total_price,
+            included_licenses=included_licenses,
+            license_price=license_price,
+            extra_license_cost=extra_license_cost,
+            final_total_price=total_price + extra_license_cost,
+            incompatible=incompatible,
+            missing_requirements=missing_requirements,
+            ledger=ledger,
+        )
+
+    def with_extra_licenses(self, result, extra_licenses):
+        """`result` with a different number of additional licenses; only the total is recomputed."""
+        extra_license_cost = extra_licenses * result.license_price
+        return replace(
+            result,
+            spec=replace(result.spec, extra_licenses=extra_licenses),
+            extra_license_cost=extra_license_cost,
+            final_total_price=result.total_price + extra_license_cost,
+            ledger=result.ledger.with_extra_licenses(extra_licenses),
+        )
+
+
+def load_engine(directory='.'):
+    """Build a QuoteEngine from the pricing tables in `directory`, without Streamlit."""
+    return QuoteEngine.from_snapshot(load_snapshot(directory))
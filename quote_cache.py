@@ -0,0 +1,115 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    entries: int
+    memory: int
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def _size_of(value):
+    # Approximate footprint of a cached result: arrays by their buffers, everything else shallow
+    size = sys.getsizeof(value)
+    for field in fields(value) if hasattr(value, '__dataclass_fields__') else ():
+        item = getattr(value, field.name)
+        if isinstance(item, np.ndarray):
+            size += item.nbytes
+        elif hasattr(item, '__dataclass_fields__'):
+            size += _size_of(item)
+        elif isinstance(item, (tuple, dict)):
+            size += sys.getsizeof(item) + sum(sys.getsizeof(x) for x in item)
+        else:
+            size += sys.getsizeof(item)
+    return size
+
+
+class QuoteCache:
+    """Process-wide LRU cache of quote results, shared by all sessions.
+
+    Entries are keyed by a canonical QuoteSpec (see QuoteEngine.canonical_spec)
+    and tagged with the pricing snapshot version: the first lookup under a new
+    version drops everything priced under the old one. Entries also expire
+    after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._evictions = self._expirations = self._invalidations = 0
+        self._memory = 0
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._memory -= size
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self._version:
+                self._invalidations += len(self._entries)
+                self._entries.clear()
+                self._memory = 0
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= self.clock():
+                self._drop(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, version, key, value):
+        size = _size_of(value)
+        with self._lock:
+            if version != self._version:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, self.clock() + self.ttl, size)
+            self._memory += size
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def get_or_compute(self, version, key, compute):
+        value = self.get(version, key)
+        if value is None:
+            # Computed outside the lock; concurrent misses on one key just price it twice
+            value = compute(key)
+            self.put(version, key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+                entries=len(self._entries),
+                memory=self._memory,
+            )
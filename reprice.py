@@ -0,0 +1,249 @@
+"""Reprice an archive of quote specs under an old and a new price list.
+
+    python reprice.py archive.jsonl --old tables-2025/ --new . -o deltas.jsonl --summary impact.csv
+
+`--old` and `--new` are each a directory of pricing CSVs or a compiled
+pricing.snapshot file. Every spec (same records as batch.py) is priced under
+both, and one delta row per quote is streamed to the output in input order.
+The summary aggregates old and new totals by currency, AuM bracket and topic;
+amounts are never summed across currencies, so every summary row carries
+its currency. All totals and deltas are quote ledger amounts (see
+ledger.QuoteLedger), summed exactly in minor currency units.
+
+In the summary, `count` is the number of quotes on currency and AuM rows,
+but the number of module lines on topic rows; the additional licenses row
+counts quotes with additional licenses. `delta_pct`, in the summary and the
+per-quote rows, is a fraction of the old total (0.098 means +9.8%).
+
+Chunks of the archive are priced in a process pool with a bounded number
+of chunks in flight, so memory stays flat on archives of any size.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from batch import _Writer, _format_for, parse_spec, positive_int, read_records
+from ledger import MINOR_UNITS
+from pricing import QuoteEngine
+from snapshot import PricingSnapshot, load_snapshot
+
+DELTA_FIELDS = ['id', 'currency', 'aum', 'contract_length', 'modules', 'old_total', 'new_total', 'delta',
+                'delta_pct', 'error']
+SUMMARY_FIELDS = ['dimension', 'key', 'currency', 'count', 'old_total', 'new_total', 'delta', 'delta_pct']
+# Additional license costs are not tied to a module, so they get their own topic row
+LICENSES_TOPIC = '(additional licenses)'
+
+_engines = None
+
+
+def load_price_list(path):
+    """A PricingSnapshot from a compiled snapshot file or a directory of CSVs."""
+    if os.path.isfile(path):
+        return PricingSnapshot.load(path)
+    return load_snapshot(path)
+
+
+def _init_worker(old_snapshot, new_snapshot):
+    global _engines
+    _engines = tuple(QuoteEngine.from_snapshot(snapshot) for snapshot in (old_snapshot, new_snapshot))
+
+
+def _add(totals, key, count, old, new):
+    entry = totals.setdefault(key, [0, 0, 0])
+    entry[0] += count
+    entry[1] += old
+    entry[2] += new
+
+
+def _topic_totals(engine, result, currencies, totals, column):
+    # Line prices summed per (topic, currency) in one bincount
+    topics = np.asarray(engine.topics)
+    names, topic_codes = np.unique(topics, return_inverse=True)
+    currency_names, currency_codes = np.unique(currencies, return_inverse=True)
+    keys = topic_codes[result.line_module_ids] * len(currency_names) + currency_codes[result.line_rows]
+    size = len(names) * len(currency_names)
+    lines = np.bincount(keys, minlength=size)
+    amounts = np.bincount(keys, weights=result.line_final_minor, minlength=size).astype(np.int64)
+    for key in np.flatnonzero(lines).tolist():
+        entry = totals.setdefault((names[key // len(currency_names)], currency_names[key % len(currency_names)]),
+                                  [0, 0, 0])
+        entry[column] += int(amounts[key])
+        if column == 1:
+            entry[0] += int(lines[key])
+
+
+def reprice_chunk(records):
+    """Price one chunk of records (dicts or JSON lines) under both price lists.
+
+    Returns the delta rows and {dimension: {(key, currency): [count, old total, new total]}},
+    with the totals in minor currency units.
+    """
+    old_engine, new_engine = _engines
+    specs, rows = [], []
+    for record in records:
+        row = {'id': None, 'error': None}
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                raise TypeError(f"expected an object, got {type(record).__name__}")
+            row['id'] = record.get('id')
+            spec = parse_spec(record)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            row['error'] = str(e)
+            rows.append(row)
+            continue
+        row.update(currency=spec.currency, aum=spec.aum, contract_length=spec.contract_length,
+                   modules=len(spec.modules))
+        # A spec can stop being valid under the new list, e.g. when a module is withdrawn
+        for name, engine in (('old', old_engine), ('new', new_engine)):
+            try:
+                engine.check_spec(spec)
+            except (KeyError, TypeError, ValueError) as e:
+                row['error'] = f"{name} price list: {e}"
+                break
+        else:
+            specs.append(spec)
+        rows.append(row)
+
+    old = old_engine.quote_batch(specs)
+    new = new_engine.quote_batch(specs)
+    old_totals = old.final_total_minor.tolist()
+    new_totals = new.final_total_minor.tolist()
+    priced = (row for row in rows if row['error'] is None)
+    for row, old_total, new_total in zip(priced, old_totals, new_totals):
+        delta = new_total - old_total
+        row.update(old_total=old_total / MINOR_UNITS, new_total=new_total / MINOR_UNITS,
+                   delta=delta / MINOR_UNITS, delta_pct=delta / old_total if old_total else None)
+
+    aggregates = {'currency': {}, 'aum': {}, 'topic': {}}
+    for spec, old_total, new_total in zip(specs, old_totals, new_totals):
+        _add(aggregates['currency'], (spec.currency, spec.currency), 1, old_total, new_total)
+        _add(aggregates['aum'], (spec.aum, spec.currency), 1, old_total, new_total)
+    if specs:
+        currencies = np.array([spec.currency for spec in specs])
+        _topic_totals(old_engine, old, currencies, aggregates['topic'], 1)
+        _topic_totals(new_engine, new, currencies, aggregates['topic'], 2)
+        old_costs = (old.final_total_minor - old.total_minor).tolist()
+        new_costs = (new.final_total_minor - new.total_minor).tolist()
+        for spec, old_cost, new_cost in zip(specs, old_costs, new_costs):
+            if spec.extra_licenses:
+                _add(aggregates['topic'], (LICENSES_TOPIC, spec.currency), 1, old_cost, new_cost)
+    return rows, aggregates
+
+
+def _merge(into, aggregates):
+    for dimension, totals in aggregates.items():
+        for key, (count, old, new) in totals.items():
+            _add(into.setdefault(dimension, {}), key, count, old, new)
+
+
+def summary_rows(aggregates):
+    for dimension in ('currency', 'aum', 'topic'):
+        for (key, currency), (count, old, new) in sorted(aggregates.get(dimension, {}).items()):
+            yield {
+                'dimension': dimension, 'key': key, 'currency': currency, 'count': count,
+                'old_total': old / MINOR_UNITS, 'new_total': new / MINOR_UNITS, 'delta': (new - old) / MINOR_UNITS,
+                'delta_pct': (new - old) / old if old else None,
+            }
+
+
+def _chunks(records, chunk_size):
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _priced_chunks(chunks, old_snapshot, new_snapshot, workers):
+    # Results come back in input order; at most 2 chunks per worker are in flight
+    if workers <= 1:
+        _init_worker(old_snapshot, new_snapshot)
+        yield from map(reprice_chunk, chunks)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(old_snapshot, new_snapshot)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(reprice_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(input_path, old_path, new_path, output_path='-', summary_path=None, workers=None, chunk_size=20000,
+        input_format=None, output_format=None, log=sys.stderr):
+    old_snapshot = load_price_list(old_path)
+    new_snapshot = load_price_list(new_path)
+    workers = workers or os.cpu_count() or 1
+    in_fmt = _format_for(input_path, input_format)
+    out_fmt = _format_for(output_path, output_format)
+    source = sys.stdin if input_path == '-' else open(input_path, newline='', encoding='utf-8')
+    target = sys.stdout if output_path == '-' else open(output_path, 'w', newline='', encoding='utf-8')
+
+    priced = failed = 0
+    aggregates = {}
+    start = time.perf_counter()
+    try:
+        writer = _Writer(target, out_fmt, DELTA_FIELDS)
+        # JSONL lines are parsed in the workers, so the reader does not bottleneck the pool
+        records = (line for line in source if line.strip()) if in_fmt == 'jsonl' else read_records(source, in_fmt)
+        chunks = _chunks(records, chunk_size)
+        for rows, chunk_aggregates in _priced_chunks(chunks, old_snapshot, new_snapshot, workers):
+            writer.write(rows)
+            _merge(aggregates, chunk_aggregates)
+            failed += sum(row['error'] is not None for row in rows)
+            priced += len(rows)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    summary = list(summary_rows(aggregates))
+    if summary_path:
+        with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+            summary_writer = csv.DictWriter(f, SUMMARY_FIELDS)
+            summary_writer.writeheader()
+            summary_writer.writerows(summary)
+
+    elapsed = time.perf_counter() - start
+    rate = priced / elapsed if elapsed else float('inf')
+    print(f"Repriced {priced} quotes ({failed} failed) on {workers} worker(s) in {elapsed:.2f}s: "
+          f"{rate:,.0f} quotes/s", file=log)
+    for row in summary:
+        if row['dimension'] == 'currency':
+            change = f"{row['delta_pct']:+.2%}" if row['delta_pct'] is not None else "n/a"
+            print(f"  {row['currency']}: {row['count']} quotes, {row['old_total']:,.2f} -> "
+                  f"{row['new_total']:,.2f} ({change})", file=log)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprice archived quote specs under an old and a new price list.")
+    parser.add_argument('input', help="Archive of quote specs, JSONL or CSV ('-' for stdin)")
+    parser.add_argument('--old', required=True, help="Old price list: CSV directory or snapshot file")
+    parser.add_argument('--new', default='.', help="New price list: CSV directory or snapshot file")
+    parser.add_argument('-o', '--output', default='-', help="Per-quote deltas ('-' for stdout)")
+    parser.add_argument('--summary', help="CSV file for the impact by currency, AuM bracket and topic "
+                                              "(count: quotes, or module lines for topics; delta_pct: a fraction)")
+    parser.add_argument('--workers', type=positive_int, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=positive_int, default=20000, help="Quotes per chunk")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'])
+    parser.add_argument('--output-format', choices=['jsonl', 'csv'])
+    args = parser.parse_args(argv)
+    run(args.input, args.old, args.new, args.output, args.summary, args.workers, args.chunk_size,
+        args.input_format, args.output_format)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Quote service: the pricing engine over HTTP with JSON bodies, for the CRM and partner portal.
+
+    python service.py --port 8080
+
+    GET  /health        current pricing snapshot version
+    POST /quote         one quote spec -> full quote with per-module lines and its ledger in minor units
+    POST /quotes        {"quotes": [spec, ...]} -> one row of totals per spec, as in batch.py
+    POST /labels/check  {"modules": [...]} -> unmet label requirements
+
+Specs have the fields of batch.py records. The server is plain asyncio with
+HTTP/1.1 keep-alive and no dependencies. Pricing tables are (re)loaded in a
+worker thread while requests keep being answered from the current engine, and
+large batches are priced off the event loop.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from http import HTTPStatus
+
+from batch import parse_spec, price_chunk
+from ledger import MINOR_UNITS
+from pricing import QuoteEngine
+from quote_cache import QuoteCache
+from snapshot import ConfigError, SnapshotStore
+
+log = logging.getLogger('service')
+
+MAX_BODY = 16 * 1024 * 1024
+MAX_BATCH = 100000
+# Batches up to this size are priced inline; larger ones in a worker thread
+INLINE_BATCH = 200
+LEDGER_COLUMNS = ('list_price', 'bundle_discount', 'multi_year_discount', 'ae_discount', 'final_price', 'variable_cost')
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def quote_json(result):
+    spec = result.spec
+    return {
+        'currency': spec.currency,
+        'aum': spec.aum,
+        'contract_length': spec.contract_length,
+        'access_methods': list(spec.access_methods),
+        'ae_discount': spec.ae_discount,
+        'extra_licenses': spec.extra_licenses,
+        'lines': [
+            {'topic': topic, 'module': module, 'list_price': list_price, 'final_price': final_price,
+             'variable_cost': variable_cost}
+            for topic, module, list_price, final_price, variable_cost in zip(
+                result.topics, result.modules, result.list_prices.tolist(), result.final_prices.tolist(),
+                result.variable_costs.tolist())
+        ],
+        'exchange_rate': result.exchange_rate,
+        'access_factor': result.access_factor,
+        'bundle_discount': result.bundle_discount,
+        'multi_year_discount': result.multi_year_discount,
+        'total_price': result.total_price,
+        'included_licenses': int(result.included_licenses),
+        'license_price': float(result.license_price),
+        'extra_license_cost': float(result.extra_license_cost),
+        'final_total_price': float(result.final_total_price),
+        'incompatible': [{'module': module, 'access_method': method} for module, method in result.incompatible],
+        'missing_requirements': missing_json(result.missing_requirements),
+        'ledger': ledger_json(result.ledger),
+    }
+
+
+def ledger_json(ledger):
+    # Columns of whole minor currency units, one entry per line
+    return {
+        'minor_units': MINOR_UNITS,
+        **{column: getattr(ledger, column).tolist() for column in LEDGER_COLUMNS},
+        'license_price': ledger.license_price,
+        'extra_license_cost': ledger.extra_license_cost,
+        'total': ledger.total,
+        'final_total': ledger.final_total,
+    }
+
+
+def missing_json(missing):
+    return {label: [{'module': module, 'metrics': count} for module, count in modules]
+            for label, modules in missing.items()}
+
+
+class QuoteService:
+    """Routes requests to the engine for the current pricing snapshot.
+
+    The snapshot store is polled every `check_interval` seconds in a worker
+    thread; a changed snapshot gets a new engine, swapped in once built. A
+    rejected price list update leaves the previous engine serving.
+    """
+
+    def __init__(self, directory='.', check_interval=1.0, cache=None):
+        self.store = SnapshotStore(directory, persist=True, check_interval=0)
+        self.check_interval = check_interval
+        self.cache = cache if cache is not None else QuoteCache(max_entries=65536, ttl=3600)
+        self.version = None
+        self.engine = None
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('POST', '/quote'): self.quote,
+            ('POST', '/quotes'): self.quotes,
+            ('POST', '/labels/check'): self.check_labels,
+        }
+
+    async def reload(self):
+        snapshot = await asyncio.to_thread(self.store.get)
+        if snapshot.version != self.version:
+            self.engine = await asyncio.to_thread(QuoteEngine.from_snapshot, snapshot)
+            self.version = snapshot.version
+            log.info("Serving pricing snapshot %s", self.version)
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.reload()
+            except Exception:
+                log.exception("Reloading the pricing tables failed")
+
+    async def health(self, body):
+        return {'status': 'ok', 'version': self.version,
+                'error': str(self.store.error) if self.store.error else None}
+
+    async def quote(self, body):
+        engine, version = self.engine, self.version
+        spec = parse_spec(body)
+        engine.check_spec(spec)
+        spec = engine.canonical_spec(spec)
+        result = self.cache.get_or_compute(version, spec, engine.quote)
+        return {'version': version, **quote_json(result)}
+
+    async def quotes(self, body):
+        records = body.get('quotes')
+        if not isinstance(records, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "expected {\"quotes\": [...]}")
+        if len(records) > MAX_BATCH:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {MAX_BATCH} quotes per batch")
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"quotes[{i}]: expected an object")
+        engine, version = self.engine, self.version
+        if len(records) <= INLINE_BATCH:
+            rows = price_chunk(engine, records)
+        else:
+            rows = await asyncio.to_thread(price_chunk, engine, records)
+        return {'version': version, 'quotes': rows}
+
+    async def check_labels(self, body):
+        engine = self.engine
+        ids = engine.module_ids_for(body.get('modules', ()))
+        return {'version': self.version, 'missing_requirements': missing_json(engine.labels.missing(ids, engine.module_names))}
+
+    async def dispatch(self, method, path, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no such endpoint: {path}")
+        if method == 'POST':
+            try:
+                body = json.loads(body)
+            except ValueError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+            if not isinstance(body, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "expected a JSON object")
+        try:
+            return await handler(body)
+        except KeyError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing field {e}")
+        except (TypeError, ValueError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = request_line.split(' ')
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'malformed request line'}, False)
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'invalid Content-Length'}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = HTTPStatus.OK, await self.dispatch(method, target.split('?')[0], body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception:
+                    log.exception("Error handling %s %s", method, target)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal error'}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+
+async def serve(host='127.0.0.1', port=8080, directory='.', check_interval=1.0):
+    service = QuoteService(directory, check_interval)
+    await service.reload()
+    watcher = asyncio.create_task(service.watch())
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_BODY)
+    log.info("Quote service listening on http://%s:%d", host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve quotes over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--tables', default='.', help="Directory containing the pricing CSVs")
+    parser.add_argument('--check-interval', type=float, default=1.0,
+                        help="Seconds between checks for changed pricing tables")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        asyncio.run(serve(args.host, args.port, args.tables, args.check_interval))
+    except (OSError, ConfigError) as e:
+        print(f"Error starting the quote service: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,458 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from fractions import Fraction
+
+# Source tables, by snapshot field
+SOURCES = {
+    'config': 'config.csv',
+    'access_methods': 'accessmethods.csv',
+    'modules': 'modules.csv',
+    'licenses': 'licenses.csv',
+    'labels': 'labels.csv',
+    'variable_costs': 'variablecost.csv',
+}
+SNAPSHOT_FILE = 'pricing.snapshot'
+FORMAT_VERSION = 3
+# Snapshot fields keyed by something other than strings, stored as [key, value] pairs
+_ITEM_FIELDS = ('module_discounts', 'access_method_factors')
+
+# How the price of an additional license is derived, see pricing.LicenseIndex
+LICENSE_RULES = ('floor', 'tier')
+
+REQUIRED_CONFIG = ('AuM Multiplier', 'Access Method', 'Module Discount', 'Contract Discount', 'Exchange Rate')
+
+
+class ConfigError(ValueError):
+    """Raised when the pricing tables fail validation. `errors` lists every problem found."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+@dataclass(frozen=True, eq=False)
+class PricingSnapshot:
+    """Validated, read-only pricing tables compiled from the CSV sources.
+
+    Tables are stored as columns (name -> tuple of parsed values), so a
+    snapshot can be loaded and used without pandas. `version` is a hash of
+    the source contents and changes whenever any price list changes.
+    Snapshot files are plain JSON: loading one never runs code.
+    """
+    version: str
+    stats: dict
+    aum_brackets: dict
+    access_methods: dict
+    module_discounts: dict
+    contract_discounts: dict
+    exchange_rates: dict
+    license_pricing: dict
+    access_method_factors: dict
+    modules: dict
+    licenses: dict
+    labels: dict
+    label_requirements: dict
+    variable_costs: dict
+    warnings: tuple = ()
+
+    def save(self, path):
+        data = {field.name: getattr(self, field.name) for field in fields(self)}
+        for name in _ITEM_FIELDS:
+            data[name] = list(data[name].items())
+        # Write to a temporary file first so readers never see a partial snapshot
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT_VERSION, 'snapshot': data}, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        data = {name: _tuples(value) for name, value in data['snapshot'].items()}
+        for name in _ITEM_FIELDS:
+            data[name] = dict(data[name])
+        return cls(**data)
+
+
+def _tuples(value):
+    """Turn the lists of a loaded JSON value back into tuples."""
+    if isinstance(value, dict):
+        return {key: _tuples(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if value and isinstance(value[0], (list, dict)):
+            return tuple(map(_tuples, value))
+        return tuple(value)
+    return value
+
+
+def parse_rate(value):
+    """Parse an exchange rate written as a number or a fraction such as "0.86/1.09"."""
+    numerator, _, denominator = str(value).partition('/')
+    rate = Fraction(numerator.strip()) / Fraction(denominator.strip() or 1)
+    if rate <= 0:
+        raise ValueError(f"exchange rate must be positive: {value}")
+    return float(rate)
+
+
+class _Table:
+    """A parsed CSV file that records validation errors instead of raising."""
+
+    def __init__(self, name, text, errors):
+        self.name = name
+        self.errors = errors
+        rows = list(csv.reader(io.StringIO(text)))
+        self.header = [column.strip() for column in rows[0]] if rows else []
+        self.rows = [row for row in rows[1:] if any(cell.strip() for cell in row)]
+
+    def error(self, message, line=None):
+        where = f"{self.name}, line {line}" if line else self.name
+        self.errors.append(f"{where}: {message}")
+
+    def require(self, *columns):
+        missing = [column for column in columns if column not in self.header]
+        if missing:
+            self.error(f"missing column(s) {', '.join(missing)}")
+        return not missing
+
+    def records(self):
+        # Line numbers count the header as line 1
+        for line, row in enumerate(self.rows, start=2):
+            cells = [cell.strip() for cell in row] + [''] * (len(self.header) - len(row))
+            yield line, dict(zip(self.header, cells))
+
+    def parse(self, parser, value, line, column):
+        try:
+            return parser(value)
+        except (TypeError, ValueError, ZeroDivisionError):
+            self.error(f"invalid {column} {value!r}", line)
+            return None
+
+
+def _boolean(value):
+    lowered = str(value).strip().lower()
+    if lowered not in ('true', 'false'):
+        raise ValueError(value)
+    return lowered == 'true'
+
+
+def _count(value):
+    count = int(float(value))
+    if count < 0 or count != float(value):
+        raise ValueError(value)
+    return count
+
+
+def _amount(value):
+    amount = float(value)
+    if amount < 0:
+        raise ValueError(value)
+    return amount
+
+
+def _fraction(value):
+    share = float(value)
+    if not 0 <= share < 1:
+        raise ValueError(value)
+    return share
+
+
+def _percentage(value):
+    share = float(value)
+    if not 0 <= share < 100:
+        raise ValueError(value)
+    return share
+
+
+def _license_rule(value):
+    if value not in LICENSE_RULES:
+        raise ValueError(value)
+    return value
+
+
+# Settings of the 'License Price' rows
+LICENSE_PRICE_PARSERS = {'Rule': _license_rule, 'Floor': _amount}
+
+
+def _compile_config(table):
+    sections = {}
+    if not table.require('Type', 'Key', 'Value'):
+        return sections
+    parsers = {
+        'AuM Multiplier': (str, _amount),
+        'Access Method': (str, float),
+        'Module Discount': (int, _fraction),
+        'Contract Discount': (str, _percentage),
+        'Exchange Rate': (str, parse_rate),
+        'License Price': (str, str),
+        'Label Requirement': (str, str),
+    }
+    for line, record in table.records():
+        kind = record['Type']
+        if kind not in parsers:
+            table.error(f"unknown configuration type {kind!r}", line)
+            continue
+        key_parser, value_parser = parsers[kind]
+        key = table.parse(key_parser, record['Key'], line, f"{kind} key")
+        if kind == 'License Price':
+            if key not in LICENSE_PRICE_PARSERS:
+                table.error(f"unknown License Price setting {key!r}", line)
+                continue
+            value_parser = LICENSE_PRICE_PARSERS[key]
+        value = table.parse(value_parser, record['Value'], line, f"{kind} value")
+        if key is None or value is None:
+            continue
+        section = sections.setdefault(kind, {})
+        if key in section:
+            table.error(f"duplicate {kind} {key!r}", line)
+        section[key] = value
+    for kind in REQUIRED_CONFIG:
+        if not sections.get(kind):
+            table.error(f"no {kind} entries")
+    return sections
+
+
+def _compile_access_methods(table, access_methods):
+    factors = {}
+    if table.header[:len(access_methods)] != list(access_methods) or len(table.header) <= len(access_methods):
+        table.error(f"columns must be {', '.join(access_methods)} followed by the price factor")
+        return factors
+    factor_column = table.header[len(access_methods)]
+    for line, record in table.records():
+        key = tuple(table.parse(_boolean, record[method], line, method) for method in access_methods)
+        factor = table.parse(float, record[factor_column], line, factor_column)
+        if None in key or factor is None:
+            continue
+        if key in factors:
+            table.error("duplicate access method combination", line)
+        factors[key] = factor
+    return factors
+
+
+def _compile_columns(table, parsers, unique=None):
+    columns = {column: [] for column in parsers}
+    if not table.require(*parsers):
+        return {column: () for column in parsers}
+    seen = set()
+    for line, record in table.records():
+        values = {column: table.parse(parser, record[column], line, column) for column, parser in parsers.items()}
+        if None in values.values():
+            continue
+        if unique:
+            if values[unique] in seen:
+                table.error(f"duplicate {unique} {values[unique]!r}", line)
+                continue
+            seen.add(values[unique])
+        for column, value in values.items():
+            columns[column].append(value)
+    return {column: tuple(values) for column, values in columns.items()}
+
+
+def _read_sources(directory):
+    stats, contents = {}, {}
+    for name in SOURCES.values():
+        path = os.path.join(directory, name)
+        with open(path, 'rb') as f:
+            contents[name] = f.read()
+        stat = os.stat(path)
+        stats[name] = (stat.st_mtime_ns, stat.st_size)
+    return stats, contents
+
+
+def _version(contents):
+    digest = hashlib.sha1()
+    for name in sorted(contents):
+        digest.update(name.encode())
+        digest.update(contents[name])
+    return digest.hexdigest()[:12]
+
+
+def compile_snapshot(directory='.'):
+    """Read and validate all pricing tables in `directory` into a PricingSnapshot.
+
+    Raises ConfigError listing every problem found, or OSError if a source is missing.
+    """
+    stats, contents = _read_sources(directory)
+    errors, warnings = [], []
+    tables = {field: _Table(name, contents[name].decode('utf-8-sig'), errors) for field, name in SOURCES.items()}
+
+    config = _compile_config(tables['config'])
+    aum_brackets = config.get('AuM Multiplier', {})
+    access_methods = config.get('Access Method', {})
+    access_method_factors = _compile_access_methods(tables['access_methods'], list(access_methods))
+
+    modules = _compile_columns(tables['modules'], {
+        'Topic': str, 'Product module': str, 'Price': _amount, **{method: _boolean for method in access_methods},
+    }, unique='Product module')
+    catalog = set(modules['Product module'])
+
+    licenses = _compile_columns(tables['licenses'], {'Ticket size': _amount, '# licenses': _count})
+
+    labels_table = tables['labels']
+    labels = _compile_columns(labels_table, {
+        'Label name': str, **{column: _count for column in labels_table.header if column != 'Label name'},
+    }, unique='Label name')
+    for label in labels['Label name']:
+        if label not in catalog:
+            labels_table.error(f"label {label!r} is not a product module")
+    # Each requirement column names the module it requires, unless mapped by a 'Label Requirement' row
+    label_requirements = {
+        column: config.get('Label Requirement', {}).get(column, column)
+        for column in labels_table.header if column != 'Label name'
+    }
+    for column, module in label_requirements.items():
+        if module not in catalog:
+            labels_table.error(f"requirement column {column!r} does not match a product module; "
+                               f"map it with a 'Label Requirement' row in {SOURCES['config']}")
+
+    variable_costs = _compile_columns(tables['variable_costs'], {
+        'Product module': str, **{method: _boolean for method in access_methods}, 'Vendor': str,
+        **{aum: _amount for aum in aum_brackets},
+    }, unique='Product module')
+    for module in variable_costs['Product module']:
+        if module not in catalog:
+            warnings.append(f"{SOURCES['variable_costs']}: {module!r} is not a product module and is ignored")
+
+    if errors:
+        raise ConfigError(errors)
+
+    return PricingSnapshot(
+        version=_version(contents),
+        stats=stats,
+        aum_brackets=aum_brackets,
+        access_methods=access_methods,
+        module_discounts=config['Module Discount'],
+        contract_discounts=config['Contract Discount'],
+        exchange_rates=config['Exchange Rate'],
+        license_pricing=config.get('License Price', {}),
+        access_method_factors=access_method_factors,
+        modules=modules,
+        licenses=licenses,
+        labels=labels,
+        label_requirements=label_requirements,
+        variable_costs=variable_costs,
+        warnings=tuple(warnings),
+    )
+
+
+def _stat_sources(directory):
+    """(mtime, size) per source file, or None when the directory ships only a snapshot file."""
+    if (not any(os.path.exists(os.path.join(directory, name)) for name in SOURCES.values())
+            and os.path.exists(os.path.join(directory, SNAPSHOT_FILE))):
+        return None
+    stats = {}
+    for name in SOURCES.values():
+        stat = os.stat(os.path.join(directory, name))
+        stats[name] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+def load_snapshot(directory='.', persist=False):
+    """Load the compiled snapshot for `directory`.
+
+    A snapshot file next to the CSVs is reused while the sources are
+    unchanged (same mtime and size, or same content hash); otherwise the
+    tables are recompiled, and the snapshot file rewritten if `persist`.
+    A directory holding only the snapshot file (see `python snapshot.py`)
+    is served from it as is.
+    """
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    stats = _stat_sources(directory)
+    if stats is None:
+        return PricingSnapshot.load(path)
+    cached = None
+    try:
+        cached = PricingSnapshot.load(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    if cached is not None and cached.stats == stats:
+        return cached
+
+    if cached is not None and _version(_read_sources(directory)[1]) == cached.version:
+        # Touched but unchanged, e.g. copied into a new image: hashing is much cheaper than compiling
+        snapshot = replace(cached, stats=stats)
+    else:
+        snapshot = compile_snapshot(directory)
+    if persist:
+        try:
+            snapshot.save(path)
+        except OSError:
+            pass
+    return snapshot
+
+
+class SnapshotStore:
+    """Holds the current snapshot for a directory, shared by every session in the process.
+
+    `get()` checks the sources' mtimes at most once per `check_interval`
+    seconds and recompiles only when they change. If an updated price list
+    fails validation the previous snapshot keeps being served and the
+    failure is kept in `error`.
+    """
+
+    def __init__(self, directory='.', persist=False, check_interval=1.0):
+        self.directory = directory
+        self.persist = persist
+        self.check_interval = check_interval
+        self.error = None
+        self._snapshot = None
+        self._stats = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._snapshot is not None and time.monotonic() - self._checked < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stats = _stat_sources(self.directory)
+                if self._snapshot is not None and stats == self._stats:
+                    return self._snapshot
+                self._stats = stats
+                self._snapshot = load_snapshot(self.directory, self.persist)
+                self.error = None
+            except (OSError, ConfigError) as e:
+                if self._snapshot is None:
+                    raise
+                self.error = e
+        return self._snapshot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the pricing CSVs into a snapshot file.")
+    parser.add_argument('--tables', default='.', help="Directory containing the pricing CSVs")
+    parser.add_argument('-o', '--output', help=f"Snapshot file (default: {SNAPSHOT_FILE} in the tables directory)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        snapshot = compile_snapshot(args.tables)
+    except ConfigError as e:
+        for error in e.errors:
+            print(error, file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error reading the pricing tables: {e}", file=sys.stderr)
+        sys.exit(1)
+    for warning in snapshot.warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    path = args.output or os.path.join(args.tables, SNAPSHOT_FILE)
+    snapshot.save(path)
+    elapsed = time.perf_counter() - start
+    print(f"Compiled pricing snapshot {snapshot.version} ({len(snapshot.modules['Product module'])} modules) "
+          f"to {path}: {os.path.getsize(path) / 1024:,.1f} KiB in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from pricing import QuoteSpec
+
+
+@dataclass(frozen=True, eq=False)
+class Bundle:
+    """Cheapest valid configuration found by the solver, priced by the engine."""
+    modules: tuple
+    access_methods: tuple
+    extras: tuple
+    quote: object
+
+
+class BundleSolver:
+    """Finds the cheapest module and access method configuration meeting a client's needs.
+
+    The bundle discount depends only on the number of modules, so for a given
+    set of access methods the best bundle is the required modules plus the k
+    cheapest available fillers for some k. The search branches over access
+    method sets and k, bounding each branch with the largest discount still
+    reachable, and memoizes the sorted filler prices per access method set.
+
+    A configuration is valid when every module is available through at least
+    one selected access method; with `strict`, through all of them (no
+    incompatibility warnings at all).
+    """
+
+    def __init__(self, engine, candidates=None):
+        self.engine = engine
+        label_ids = set(engine.labels.label_module_ids.tolist())
+        allowed = engine.module_names if candidates is None else candidates
+        # Labels bring requirements of their own, so they are never added as fillers
+        self.candidates = np.array(sorted(
+            module_id for module_id in engine.module_ids_for(allowed).tolist() if module_id not in label_ids
+        ), dtype=np.intp)
+        # Largest bundle discount reachable with at least n modules
+        self.best_discounts = np.maximum.accumulate(engine.bundle_discounts[::-1])[::-1]
+        self._fillers = {}
+
+    def required_modules(self, labels=(), modules=()):
+        """Module ids needed for the given labels and modules, including the labels' requirements."""
+        engine = self.engine
+        required = dict.fromkeys(engine.module_ids_for(modules).tolist())
+        label_positions = {name: i for i, name in enumerate(engine.labels.labels)}
+        for label in labels:
+            if label not in label_positions:
+                raise ValueError(f"Unknown label: {label}")
+            required[engine.module_ids[label]] = None
+            required.update(dict.fromkeys(engine.labels.requirements[label_positions[label]]))
+        return np.array(list(required), dtype=np.intp)
+
+    def _valid(self, module_ids, access_mask, strict):
+        selected = self.engine.selected_methods(access_mask)
+        availability = self.engine.availability[module_ids]
+        if strict:
+            return (availability | ~selected).all(axis=1)
+        return (availability & selected).any(axis=1)
+
+    def _sorted_fillers(self, access_mask, strict):
+        # Fillers valid with the selected access methods, cheapest first
+        key = (access_mask, strict)
+        if key not in self._fillers:
+            available = self.candidates[self._valid(self.candidates, access_mask, strict)]
+            order = np.argsort(self.engine.prices[available], kind='stable')
+            self._fillers[key] = available[order]
+        return self._fillers[key]
+
+    def cheapest(self, currency, aum, contract_length, labels=(), modules=(), access_methods=(),
+                 allow_extras=True, strict=False):
+        engine = self.engine
+        engine.check_spec(QuoteSpec(currency, aum, contract_length, tuple(access_methods), tuple(modules)))
+        required = self.required_modules(labels, modules)
+        required_access = engine.access_mask(access_methods)
+        base = float(engine.prices[required].sum())
+        count = len(required)
+        in_required = np.zeros(len(engine.module_names), dtype=bool)
+        in_required[required] = True
+
+        best_total, best = np.inf, None
+        # Only access method combinations with a listed price factor are offered
+        masks = [mask for mask in np.flatnonzero(engine.priced_access).tolist()
+                 if mask and mask & required_access == required_access]
+        # Cheapest access factors first, so good bounds are found early; fewer methods win ties
+        for mask in sorted(masks, key=lambda mask: (engine.access_factors[mask], bin(mask).count('1'))):
+            factor = 1 + engine.access_factors[mask]
+            if base * factor * (1 - self.best_discounts[count]) >= best_total:
+                continue
+            if not self._valid(required, mask, strict).all():
+                continue
+
+            fillers = self._sorted_fillers(mask, strict) if allow_extras else required[:0]
+            fillers = fillers[~in_required[fillers]]
+            partial = np.concatenate(([0.0], np.cumsum(engine.prices[fillers])))
+            for extra in range(len(partial)):
+                subtotal = (base + partial[extra]) * factor
+                if subtotal * (1 - self.best_discounts[count + extra]) >= best_total:
+                    break
+                total = subtotal * (1 - engine.bundle_discounts[count + extra])
+                if total < best_total:
+                    best_total, best = total, (mask, fillers[:extra])
+
+        if best is None:
+            return None
+        mask, extras = best
+        chosen = np.concatenate((required, extras))
+        spec = QuoteSpec(
+            currency=currency,
+            aum=aum,
+            contract_length=contract_length,
+            access_methods=tuple(method for method, on in zip(engine.access_methods, engine.selected_methods(mask)) if on),
+            modules=tuple(engine.module_names[i] for i in sorted(chosen.tolist())),
+        )
+        return Bundle(
+            modules=spec.modules,
+            access_methods=spec.access_methods,
+            extras=tuple(engine.module_names[i] for i in extras),
+            quote=engine.quote(spec),
+        )
+
+
+def cheapest_bundle(engine, currency, aum, contract_length, labels=(), modules=(), access_methods=(),
+                    allow_extras=True, strict=False, candidates=None):
+    """Cheapest valid bundle covering `labels` (with their requirements) and `modules`,
+    using at least `access_methods`. Returns None if no valid configuration exists."""
+    return BundleSolver(engine, candidates).cheapest(
+        currency, aum, contract_length, labels, modules, access_methods, allow_extras, strict)
@@ -0,0 +1,54 @@
+import os
+import random
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pricing import ACCESS_METHODS, QuoteSpec, load_engine  # noqa: E402
+from snapshot import SOURCES  # noqa: E402
+
+AE_DISCOUNTS = (0, 0.05, 0.1, 0.15)
+
+
+def random_specs(engine, count, seed=0):
+    rng = random.Random(seed)
+    return [QuoteSpec(
+        currency=rng.choice(list(engine.exchange_rates)),
+        aum=rng.choice(list(engine.aum_brackets)),
+        contract_length=rng.choice(list(engine.contract_discounts)),
+        access_methods=tuple(method for method in ACCESS_METHODS if rng.random() < 0.4),
+        modules=tuple(rng.sample(engine.module_names, rng.randint(1, 12))),
+        ae_discount=rng.choice(AE_DISCOUNTS),
+        extra_licenses=rng.randint(0, 4),
+    ) for _ in range(count)]
+
+
+@pytest.fixture(scope='session')
+def tables():
+    """Directory holding the shipped pricing CSVs."""
+    return ROOT
+
+
+@pytest.fixture(scope='session')
+def engine(tables):
+    return load_engine(tables)
+
+
+@pytest.fixture(scope='session')
+def specs(engine):
+    """Random quote specs over the shipped tables."""
+    return random_specs(engine, 500)
+
+
+@pytest.fixture
+def table_copy(tables, tmp_path):
+    """A writable copy of the shipped pricing CSVs."""
+    directory = tmp_path / 'tables'
+    directory.mkdir()
+    for name in SOURCES.values():
+        shutil.copy(os.path.join(tables, name), directory)
+    return directory
@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from batch import RecordError, main, price_chunk, read_records, run
+
+SPEC = {'currency': 'EUR', 'aum': '<0.5Bn', 'contract_length': '2 year', 'access_methods': ['API'],
+        'modules': ['Exposures', 'SFDR PAIs']}
+
+
+def test_read_records_turns_bad_lines_into_errors():
+    records = list(read_records(io.StringIO('{"id": 1}\n\nnot json\n{"id": 2}\n'), 'jsonl'))
+    assert records[0] == {'id': 1} and records[2] == {'id': 2}
+    assert isinstance(records[1], RecordError)
+    assert str(records[1]).startswith('line 3: invalid JSON')
+
+
+@pytest.mark.parametrize('record, error', [
+    (5, 'expected an object'),
+    ({'aum': '<0.5Bn', 'contract_length': '1 year'}, "'currency'"),
+    ({**SPEC, 'modules': ['No such module']}, 'Unknown product module'),
+    ({**SPEC, 'modules': [['Exposures']]}, 'unhashable'),
+    ({**SPEC, 'currency': 'CHF'}, 'Unknown currency'),
+    ({**SPEC, 'ae_discount': 5}, 'ae_discount'),
+    ({**SPEC, 'extra_licenses': -3}, 'extra_licenses'),
+    ({**SPEC, 'extra_licenses': 2.5}, 'extra_licenses'),
+    ({**SPEC, 'extra_licenses': 1e30}, 'extra_licenses'),
+    (RecordError('line 7: invalid JSON'), 'line 7'),
+])
+def test_bad_records_become_error_rows(engine, record, error):
+    rows = price_chunk(engine, [SPEC, record, {**SPEC, 'id': 'last'}])
+    assert rows[0]['error'] is None and rows[2]['error'] is None
+    assert rows[2]['id'] == 'last'
+    assert error in rows[1]['error']
+    assert 'final_total_minor' not in rows[1]
+
+
+def test_run_keeps_going_past_bad_lines(tables, tmp_path):
+    source = tmp_path / 'quotes.jsonl'
+    source.write_text('\n'.join([json.dumps({**SPEC, 'id': 1}), 'not json', json.dumps({**SPEC, 'id': 3})]) + '\n')
+    target = tmp_path / 'priced.jsonl'
+    assert run(str(source), str(target), tables, chunk_size=2, log=io.StringIO()) == (3, 1)
+    rows = [json.loads(line) for line in target.read_text().splitlines()]
+    assert [row['id'] for row in rows] == [1, None, 3]
+    assert rows[1]['error'].startswith('line 2: invalid JSON')
+    assert rows[0]['final_total_minor'] == rows[2]['final_total_minor']
+
+
+@pytest.mark.parametrize('chunk_size', ['0', '-5', 'ten'])
+def test_chunk_size_must_be_positive(chunk_size, capsys):
+    with pytest.raises(SystemExit):
+        main(['quotes.jsonl', '--chunk-size', chunk_size])
+    assert '--chunk-size' in capsys.readouterr().err
@@ -0,0 +1,32 @@
+import numpy as np
+
+from ledger import QuoteLedger, format_amounts
+
+
+def test_ledger_rounds_each_discount_on_the_remaining_amount():
+    ledger = QuoteLedger.from_lines('EUR', [100.005, 33.333], 0.15, 0.1, 0.05, [0.0, 1.234], 5000.0, 2)
+    np.testing.assert_array_equal(ledger.list_price, [10000, 3333])
+    np.testing.assert_array_equal(ledger.bundle_discount, [1500, 500])
+    np.testing.assert_array_equal(ledger.multi_year_discount, [850, 283])
+    np.testing.assert_array_equal(ledger.ae_discount, [382, 128])
+    np.testing.assert_array_equal(
+        ledger.list_price - ledger.bundle_discount - ledger.multi_year_discount - ledger.ae_discount,
+        ledger.final_price)
+    assert ledger.total == int(ledger.final_price.sum())
+    assert ledger.final_total == ledger.total + 2 * 500000
+    assert ledger.variable_total == 123
+
+
+def test_format_amounts():
+    assert format_amounts([0, 5, 123456, -100000000], 'GBP').tolist() == [
+        '£0.00', '£0.05', '£1,234.56', '-£1,000,000.00']
+    assert format_amounts(12345, 'CHF').tolist() == 'CHF 123.45'
+
+
+def test_quote_batch_matches_ledger(engine, specs):
+    result = engine.quote_batch(specs)
+    for row, spec in enumerate(specs):
+        ledger = engine.quote(spec).ledger
+        assert result.total_minor[row] == ledger.total
+        assert result.final_total_minor[row] == ledger.final_total
+        np.testing.assert_array_equal(result.line_final_minor[result.line_rows == row], ledger.final_price)
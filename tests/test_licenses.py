@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from pricing import LicenseIndex, load_engine
+
+TICKET_SIZES = (41000, 5000, 20000)
+LICENSES = (2, 1, 1)
+
+
+def test_tiers_cover_totals_up_to_their_ticket_size():
+    index = LicenseIndex(TICKET_SIZES, LICENSES)
+    assert [index.included(total) for total in (0, 5000, 5000.01, 41000, 1e9)] == [1, 1, 1, 2, 2]
+    np.testing.assert_array_equal(index.included(np.array([100, 20001, 50000])), [1, 2, 2])
+
+
+def test_floor_rule_prices_at_the_first_tier_at_or_above_the_floor():
+    assert LicenseIndex(TICKET_SIZES, LICENSES).price(30000) == 5000
+    assert LicenseIndex(TICKET_SIZES, LICENSES, floor=6000).price(100) == 20000
+    assert LicenseIndex(TICKET_SIZES, LICENSES, floor=1e6).price(100) == 41000
+
+
+def test_tier_rule_prices_at_the_quote_tier():
+    index = LicenseIndex(TICKET_SIZES, LICENSES, rule='tier')
+    assert index.price(100) == 5000
+    assert index.price(30000) == 41000 / 2
+    np.testing.assert_array_equal(index.price(np.array([100, 10000, 1e9])), [5000, 20000, 20500])
+
+
+def test_empty_table_and_unknown_rule():
+    index = LicenseIndex((), ())
+    assert index.included(1000) == 1 and index.price(1000) == 1.0
+    with pytest.raises(ValueError, match='Unknown license pricing rule'):
+        LicenseIndex(TICKET_SIZES, LICENSES, rule='Tier')
+
+
+def test_engine_uses_the_configured_tier_rule(table_copy, specs):
+    config = (table_copy / 'config.csv').read_text(encoding='utf-8')
+    (table_copy / 'config.csv').write_text(config.replace('License Price,Rule,floor', 'License Price,Rule,tier'),
+                                           encoding='utf-8')
+    engine = load_engine(table_copy)
+    ticket_sizes = np.array(engine.licenses.ticket_sizes)
+    counts = np.array(engine.licenses.license_counts)
+
+    batch = engine.quote_batch(specs)
+    for row, spec in enumerate(specs):
+        quote = engine.quote(spec)
+        tier = min(np.searchsorted(ticket_sizes, quote.total_price), len(ticket_sizes) - 1)
+        assert quote.license_price == ticket_sizes[tier] / counts[tier]
+        assert batch.license_price[row] == quote.license_price
+        assert quote.ledger.final_total == quote.ledger.total + spec.extra_licenses * round(quote.license_price * 100)
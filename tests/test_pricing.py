@@ -0,0 +1,179 @@
+"""QuoteEngine against the formulas of the original configurator page.
+
+`Baseline` restates the pricing logic of the page before QuoteEngine was
+extracted: pandas tables and per-module row lookups, priced one quote at a
+time. The page summed the formatted line prices; the engine sums the
+unrounded ones, which is what these totals are compared against.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import AE_DISCOUNTS
+from pricing import ACCESS_METHODS, QuoteSpec, load_engine
+
+# The page's hard-coded label columns and the module each one requires
+LABEL_COLUMNS = {
+    'Exposures': 'Exposures',
+    'ESG Risk': 'ESG Risk',
+    'SFDR PAIs': 'SFDR PAIs',
+    'UN SDGs Alignment': 'UN SDGs Alignment',
+    'Carbon Footprint': 'Carbon Footprint',
+    'EU Taxonomy - product level reporting': 'EU Taxonomy - product level reporting',
+    'Other': 'Emissions / Up to 10 metrics',
+}
+
+
+class Baseline:
+    def __init__(self, directory):
+        def read(name):
+            return pd.read_csv(os.path.join(directory, name))
+
+        config = read('config.csv')
+
+        def settings(kind, key=str, value=float):
+            rows = config[config['Type'] == kind]
+            return {key(k.strip() if isinstance(k, str) else k): value(v) for k, v in zip(rows['Key'], rows['Value'])}
+
+        def rate(value):
+            numerator, _, denominator = value.partition('/')
+            return float(numerator) / float(denominator or 1)
+
+        self.aum_brackets = settings('AuM Multiplier')
+        self.module_discounts = settings('Module Discount', key=int)
+        self.contract_discounts = settings('Contract Discount')
+        self.exchange_rates = settings('Exchange Rate', value=rate)
+        self.access_method_factors = {
+            tuple(str(value).lower() == 'true' for value in row[:4]): float(str(row[4]).strip())
+            for row in read('accessmethods.csv').itertuples(index=False)
+        }
+        self.modules = read('modules.csv')
+        self.modules.columns = self.modules.columns.str.strip()
+        self.licenses = read('licenses.csv')
+        self.labels = read('labels.csv')
+        self.variable_costs = read('variablecost.csv')
+
+    def calculate_discount(self, module_count, contract_length):
+        module_discount = self.module_discounts.get(module_count, self.module_discounts[7] if module_count > 7 else 0)
+        contract_discount = self.contract_discounts.get(contract_length)
+        return 1 - (1 - module_discount) * (1 - contract_discount)
+
+    def included_licenses(self, total_price):
+        for _, row in self.licenses.iterrows():
+            if total_price <= row['Ticket size']:
+                return row['# licenses']
+        return self.licenses.iloc[-1]['# licenses']
+
+    def license_price(self):
+        for _, row in self.licenses.iterrows():
+            if 5000 <= row['Ticket size']:
+                return row['Ticket size']
+        return self.licenses.iloc[-1]['# licenses']
+
+    def missing_requirements(self, modules):
+        missing = {}
+        for label in (module for module in modules if module in self.labels['Label name'].values):
+            requirements = self.labels[self.labels['Label name'] == label].iloc[0]
+            unmet = [(module, int(requirements[column])) for column, module in LABEL_COLUMNS.items()
+                     if int(requirements[column]) > 0 and module not in modules]
+            if unmet:
+                missing[label] = unmet
+        return missing
+
+    def quote(self, spec):
+        """{module: (list price, final price, variable cost)} and the quote totals."""
+        selected = {method: method in spec.access_methods for method in ACCESS_METHODS}
+        access_multiplier = self.access_method_factors.get(tuple(selected[method] for method in ACCESS_METHODS), 0)
+        bundle_discount = self.calculate_discount(len(spec.modules), '1 year')
+        multi_year_discount = self.contract_discounts.get(spec.contract_length) / 100
+        rate = self.exchange_rates[spec.currency]
+        aum_column = next(column for column in self.variable_costs.columns if spec.aum in column)
+
+        lines, incompatible = {}, set()
+        for module in spec.modules:
+            row = self.modules[self.modules['Product module'] == module].iloc[0]
+            list_price = pd.to_numeric(row['Price'], errors='coerce') * self.aum_brackets[spec.aum] * rate
+            list_price *= 1 + access_multiplier
+            final_price = list_price * (1 - bundle_discount) * (1 - multi_year_discount) * (1 - spec.ae_discount)
+            costs = self.variable_costs[self.variable_costs['Product module'] == module]
+            variable_cost = 0
+            if not costs.empty and any(selected[method] and costs.iloc[0].get(method, False) for method in ACCESS_METHODS):
+                variable_cost = costs[aum_column].values[0] * rate
+            lines[module] = (list_price, final_price, variable_cost)
+            incompatible.update((module, method) for method, on in selected.items() if on and on != row[method])
+
+        total_price = sum(final_price for _, final_price, _ in lines.values())
+        license_price = self.license_price()
+        return {
+            'lines': lines,
+            'total_price': total_price,
+            'included_licenses': self.included_licenses(total_price),
+            'license_price': license_price,
+            'final_total_price': total_price + spec.extra_licenses * license_price,
+            'incompatible': incompatible,
+            'missing_requirements': self.missing_requirements(spec.modules),
+        }
+
+
+@pytest.fixture(scope='module')
+def baseline(tables):
+    return Baseline(tables)
+
+
+def test_quote_matches_baseline(engine, baseline, specs):
+    for spec in specs:
+        expected = baseline.quote(spec)
+        result = engine.quote(spec)
+        lines = [expected['lines'][module] for module in result.modules]
+        np.testing.assert_allclose(result.list_prices, [line[0] for line in lines], rtol=1e-12)
+        np.testing.assert_allclose(result.final_prices, [line[1] for line in lines], rtol=1e-12)
+        np.testing.assert_allclose(result.variable_costs, [line[2] for line in lines], rtol=1e-12)
+        assert result.total_price == pytest.approx(expected['total_price'], rel=1e-12)
+        assert result.included_licenses == expected['included_licenses']
+        assert result.license_price == expected['license_price']
+        assert result.final_total_price == pytest.approx(expected['final_total_price'], rel=1e-12)
+        assert set(result.incompatible) == expected['incompatible']
+        assert result.missing_requirements == expected['missing_requirements']
+
+
+def test_quote_batch_matches_baseline(engine, baseline, specs):
+    result = engine.quote_batch(specs)
+    for row, spec in enumerate(specs):
+        expected = baseline.quote(spec)
+        assert result.total_price[row] == pytest.approx(expected['total_price'], rel=1e-12)
+        assert result.included_licenses[row] == expected['included_licenses']
+        assert result.license_price[row] == expected['license_price']
+        assert result.final_total_price[row] == pytest.approx(expected['final_total_price'], rel=1e-12)
+        assert result.variable_cost[row] == pytest.approx(sum(line[2] for line in expected['lines'].values()),
+                                                          rel=1e-12)
+        assert result.incompatible[row] == len(expected['incompatible'])
+        assert result.missing_labels[row] == len(expected['missing_requirements'])
+
+
+def test_price_cube_matches_ledger(engine, specs):
+    for spec in specs[:20]:
+        cube = engine.price_cube(spec.modules, spec.access_methods, AE_DISCOUNTS, spec.extra_licenses)
+        for currency in cube.currencies:
+            for ae_discount in AE_DISCOUNTS:
+                matrix = cube.matrix(currency, ae_discount)
+                for i, aum in enumerate(cube.aum_brackets):
+                    for j, contract_length in enumerate(cube.contract_lengths):
+                        quote = engine.quote(QuoteSpec(currency, aum, contract_length, spec.access_methods,
+                                                       spec.modules, ae_discount, spec.extra_licenses))
+                        assert matrix[i, j] == quote.ledger.final_total
+
+
+def test_contract_row_order_does_not_change_prices(engine, specs, table_copy):
+    with open(table_copy / 'config.csv', encoding='utf-8') as f:
+        lines = f.readlines()
+    contracts = [line for line in lines if line.startswith('Contract Discount,')]
+    others = [line for line in lines if not line.startswith('Contract Discount,')]
+    (table_copy / 'config.csv').write_text(''.join(others[:1] + contracts[::-1] + others[1:]), encoding='utf-8')
+    reordered = load_engine(table_copy)
+
+    assert list(reordered.contract_discounts) == list(engine.contract_discounts)[::-1]
+    np.testing.assert_array_equal(reordered.bundle_discounts, engine.bundle_discounts)
+    for spec in specs[:50]:
+        assert reordered.quote(spec).ledger.final_total == engine.quote(spec).ledger.final_total
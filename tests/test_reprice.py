@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import shutil
+
+import pytest
+
+from batch import parse_spec
+from pricing import load_engine
+from reprice import LICENSES_TOPIC, run
+
+SPEC = {'currency': 'EUR', 'aum': '<0.5Bn', 'contract_length': '2 year', 'access_methods': ['API'],
+        'modules': ['Exposures', 'SFDR PAIs']}
+
+
+def edit(path, old, new):
+    text = path.read_text(encoding='utf-8')
+    assert old in text
+    path.write_text(text.replace(old, new, 1), encoding='utf-8')
+
+
+@pytest.fixture
+def price_lists(table_copy, tmp_path):
+    """Old and new tables: the new list raises SFDR PAIs and withdraws UK SDR."""
+    new = tmp_path / 'new'
+    shutil.copytree(table_copy, new)
+    edit(new / 'modules.csv', 'Regulatory,SFDR PAIs,33000', 'Regulatory,SFDR PAIs,36300')
+    edit(new / 'modules.csv', 'Regulatory,UK SDR,33000,True,True,False,True\n', '')
+    return table_copy, new
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_reprice_rows_and_summary(price_lists, tmp_path, workers):
+    old_tables, new_tables = price_lists
+    records = [
+        json.dumps({**SPEC, 'id': 1}),
+        json.dumps({**SPEC, 'id': 2, 'modules': SPEC['modules'] + ['UK SDR']}),
+        'not json',
+        '5',
+        json.dumps({**SPEC, 'id': 5, 'modules': [['Exposures']]}),
+        json.dumps({**SPEC, 'id': 6, 'currency': 'USD', 'extra_licenses': 2}),
+        json.dumps({**SPEC, 'id': 7, 'aum': '1-5Bn'}),
+    ]
+    archive = tmp_path / 'archive.jsonl'
+    archive.write_text('\n'.join(records) + '\n')
+    output, summary_path = tmp_path / 'deltas.jsonl', tmp_path / 'summary.csv'
+    run(str(archive), str(old_tables), str(new_tables), str(output), str(summary_path), workers=workers,
+        chunk_size=3, log=io.StringIO())
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row['id'] for row in rows] == [1, 2, None, None, 5, 6, 7]
+    assert rows[1]['error'] == 'new price list: Unknown product module: UK SDR'
+    assert rows[2]['error'] and rows[3]['error'].startswith('expected an object')
+    assert rows[4]['error'].startswith('old price list: unhashable')
+
+    old_engine, new_engine = load_engine(old_tables), load_engine(new_tables)
+    priced = [row for row in rows if row['error'] is None]
+    assert [row['id'] for row in priced] == [1, 6, 7]
+    specs = {record['id']: parse_spec(record) for record in map(json.loads, records[:2] + records[5:])}
+    for row in priced:
+        spec = specs[row['id']]
+        old = old_engine.quote(spec).ledger.final_total
+        new = new_engine.quote(spec).ledger.final_total
+        assert row['old_total'] == old / 100 and row['new_total'] == new / 100
+        assert row['delta'] == (new - old) / 100
+        assert row['delta_pct'] == pytest.approx((new - old) / old)
+        assert 0 < row['delta_pct'] < 1
+
+    with open(summary_path, newline='') as f:
+        summary = list(csv.DictReader(f))
+    by_dimension = {}
+    for row in summary:
+        by_dimension.setdefault(row['dimension'], []).append(row)
+    for currency, quotes in (('EUR', [rows[0], rows[6]]), ('USD', [rows[5]])):
+        [total] = [row for row in by_dimension['currency'] if row['key'] == currency]
+        # Quotes on currency rows, module lines (and quotes with additional licenses) on topic rows
+        assert int(total['count']) == len(quotes)
+        topics = [row for row in by_dimension['topic'] if row['currency'] == currency]
+        lines = sum(int(row['count']) for row in topics if row['key'] != LICENSES_TOPIC)
+        assert lines == 2 * len(quotes)
+        for column in ('old_total', 'new_total'):
+            expected = sum(round(quote[column] * 100) for quote in quotes)
+            assert round(float(total[column]) * 100) == expected
+            assert sum(round(float(row[column]) * 100) for row in topics) == expected
+    assert [row['count'] for row in by_dimension['topic'] if row['key'] == LICENSES_TOPIC] == ['1']
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+from batch import parse_spec
+from service import MAX_BODY, QuoteService
+
+SPEC = {'currency': 'EUR', 'aum': '<0.5Bn', 'contract_length': '2 year', 'access_methods': ['API'],
+        'modules': ['Exposures', 'SFDR PAIs']}
+
+
+def post(path, body):
+    body = body if isinstance(body, bytes) else json.dumps(body).encode()
+    return f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+
+
+def exchange(directory, *requests):
+    """Send raw requests to a quote service on a free port, one connection each: [(status, payload)]."""
+    async def session():
+        service = QuoteService(directory, check_interval=3600)
+        await service.reload()
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0, limit=MAX_BODY)
+        port = server.sockets[0].getsockname()[1]
+        responses = []
+        async with server:
+            for request in requests:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(request)
+                response = await asyncio.wait_for(reader.read(), 10)
+                writer.close()
+                head, _, body = response.partition(b'\r\n\r\n')
+                responses.append((int(head.split()[1]), json.loads(body)))
+        return responses
+    return asyncio.run(session())
+
+
+@pytest.fixture
+def directory(table_copy):
+    return str(table_copy)
+
+
+def test_quotes_and_health(directory, engine):
+    (status, health), (quote_status, quote), (batch_status, batch) = exchange(
+        directory,
+        b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n",
+        post('/quote', {**SPEC, 'extra_licenses': 2}),
+        post('/quotes', {'quotes': [SPEC, {**SPEC, 'ae_discount': 5}]}),
+    )
+    assert status == quote_status == batch_status == 200
+    assert health['status'] == 'ok' and health['version'] == quote['version']
+    expected = engine.quote(engine.canonical_spec(parse_spec({**SPEC, 'extra_licenses': 2})))
+    assert quote['ledger']['final_total'] == expected.ledger.final_total
+    assert batch['quotes'][0]['error'] is None
+    assert 'ae_discount' in batch['quotes'][1]['error']
+
+
+@pytest.mark.parametrize('request_bytes, status, error', [
+    (post('/quote', {**SPEC, 'ae_discount': 5}), 400, 'ae_discount'),
+    (post('/quote', {**SPEC, 'extra_licenses': -3}), 400, 'extra_licenses'),
+    (post('/quote', {**SPEC, 'extra_licenses': 1e30}), 400, 'extra_licenses'),
+    (post('/quote', {**SPEC, 'modules': ['No such module']}), 400, 'Unknown product module'),
+    (post('/quote', {'aum': '<0.5Bn'}), 400, 'missing field'),
+    (post('/quote', b'not json'), 400, 'invalid JSON'),
+    (post('/quote', [SPEC]), 400, 'expected a JSON object'),
+    (post('/quotes', {'quotes': [SPEC, 5]}), 400, 'quotes[1]: expected an object'),
+    (post('/quotes', {'quotes': 'all'}), 400, 'expected {"quotes"'),
+    (b"POST /quote HTTP/1.1\r\nContent-Length: abc\r\n\r\n{}", 400, 'invalid Content-Length'),
+    (b"POST /quote HTTP/1.1\r\nContent-Length: -5\r\n\r\n{}", 400, 'invalid Content-Length'),
+    (b"POST /quote HTTP/1.1\r\nContent-Length: 99999999999\r\n\r\n{}", 413, 'too large'),
+    (b"GET /quote HTTP/1.1\r\nConnection: close\r\n\r\n", 405, 'not allowed'),
+    (b"GET /prices HTTP/1.1\r\nConnection: close\r\n\r\n", 404, 'no such endpoint'),
+])
+def test_bad_requests_are_answered_with_errors(directory, request_bytes, status, error):
+    [(response_status, payload)] = exchange(directory, request_bytes)
+    assert response_status == status
+    assert error in payload['error']
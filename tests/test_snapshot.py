@@ -0,0 +1,90 @@
+import json
+import os
+import pickle
+from dataclasses import fields
+
+import pytest
+
+from pricing import QuoteEngine
+from snapshot import SNAPSHOT_FILE, ConfigError, PricingSnapshot, SnapshotStore, compile_snapshot, load_snapshot, main
+
+
+def edit(path, old, new):
+    """Replace text in a source table, moving its mtime forward so the change is always seen."""
+    text = path.read_text(encoding='utf-8')
+    assert old in text
+    path.write_text(text.replace(old, new, 1), encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def assert_same(snapshot, other):
+    for field in fields(PricingSnapshot):
+        assert getattr(snapshot, field.name) == getattr(other, field.name), field.name
+
+
+def test_snapshot_file_round_trips_as_json(table_copy, tmp_path):
+    snapshot = compile_snapshot(table_copy)
+    path = tmp_path / 'pricing.snapshot'
+    snapshot.save(path)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['snapshot']['version'] == snapshot.version
+    loaded = PricingSnapshot.load(path)
+    assert_same(loaded, snapshot)
+    assert isinstance(next(iter(loaded.access_method_factors)), tuple)
+    assert isinstance(next(iter(loaded.module_discounts)), int)
+    QuoteEngine.from_snapshot(loaded)
+
+
+def test_pickled_snapshot_is_recompiled_not_loaded(table_copy):
+    path = table_copy / SNAPSHOT_FILE
+    path.write_bytes(pickle.dumps((2, {'version': 'stale'})))
+    snapshot = load_snapshot(table_copy, persist=True)
+    assert snapshot.version == compile_snapshot(table_copy).version
+    assert_same(PricingSnapshot.load(path), snapshot)
+
+
+def test_snapshot_only_directory(table_copy, tmp_path, capsys):
+    served = tmp_path / 'served'
+    served.mkdir()
+    main(['--tables', str(table_copy), '-o', str(served / SNAPSHOT_FILE)])
+    assert 'Compiled pricing snapshot' in capsys.readouterr().out
+    assert_same(load_snapshot(served), compile_snapshot(table_copy))
+
+
+@pytest.mark.parametrize('name, old, new, error', [
+    ('config.csv', 'License Price,Rule,floor', 'License Price,Rule,Tier', "invalid License Price value 'Tier'"),
+    ('config.csv', 'License Price,Floor,5000', 'License Price,Floor,-1', "invalid License Price value '-1'"),
+    ('config.csv', 'License Price,Floor,5000', 'License Price,Ceiling,5000', "unknown License Price setting"),
+    ('config.csv', 'Exchange Rate,USD,"1/1"', 'Exchange Rate,USD,"1/0"', 'invalid Exchange Rate value'),
+    ('config.csv', 'Contract Discount,"2 year",10', 'Contract Discount,"2 year",110', 'Contract Discount value'),
+    ('modules.csv', 'Regulatory,UK SDR,33000', 'Regulatory,SFDR PAIs,33000', "duplicate Product module"),
+    ('modules.csv', 'Regulatory,UK SDR,33000', 'Regulatory,UK SDR,free', "invalid Price 'free'"),
+    ('licenses.csv', '5000,1', '5000,1.5', "invalid # licenses"),
+])
+def test_invalid_tables_are_rejected(table_copy, name, old, new, error):
+    edit(table_copy / name, old, new)
+    with pytest.raises(ConfigError) as raised:
+        compile_snapshot(table_copy)
+    assert any(error in message and message.startswith(name) for message in raised.value.errors), raised.value.errors
+
+
+def test_store_reloads_changes_and_keeps_serving_after_a_rejected_update(table_copy):
+    store = SnapshotStore(table_copy, check_interval=0)
+    first = store.get()
+    assert store.get() is first
+
+    edit(table_copy / 'modules.csv', 'Regulatory,UK SDR,33000', 'Regulatory,UK SDR,34000')
+    second = store.get()
+    assert second.version != first.version
+    assert QuoteEngine.from_snapshot(second).prices[second.modules['Product module'].index('UK SDR')] == 34000
+
+    edit(table_copy / 'config.csv', 'License Price,Rule,floor', 'License Price,Rule,Tier')
+    assert store.get() is second
+    assert isinstance(store.error, ConfigError)
+    QuoteEngine.from_snapshot(store.get())
+
+    edit(table_copy / 'config.csv', 'License Price,Rule,Tier', 'License Price,Rule,tier')
+    third = store.get()
+    assert store.error is None
+    assert third.license_pricing['Rule'] == 'tier'
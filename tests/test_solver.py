@@ -0,0 +1,98 @@
+"""BundleSolver against an exhaustive search over small random catalogs."""
+import itertools
+import random
+
+import pytest
+
+from pricing import ACCESS_METHODS, QuoteEngine
+from solver import BundleSolver
+
+MODULES = 8
+LABEL = 'Label'
+
+
+def random_engine(rng):
+    names = [f"Module {i}" for i in range(MODULES - 1)] + [LABEL]
+    modules = {
+        'Topic': ('Topic',) * MODULES,
+        'Product module': tuple(names),
+        'Price': tuple(float(rng.randrange(1000, 40000, 500)) for _ in names),
+        **{method: tuple(rng.random() < 0.7 for _ in names) for method in ACCESS_METHODS},
+    }
+    # A listed factor for only some access method combinations, as in accessmethods.csv
+    combinations = list(itertools.product((False, True), repeat=len(ACCESS_METHODS)))[1:]
+    factors = {key: round(rng.uniform(-0.2, 0.3), 2) for key in rng.sample(combinations, rng.randint(1, 8))}
+    return QuoteEngine(
+        modules=modules,
+        aum_brackets={'Small': 1.0, 'Large': 1.5},
+        exchange_rates={'EUR': 1.0, 'USD': 1.1},
+        # Not always increasing, so an extra module can lower the discount
+        module_discounts={count: rng.choice((0, 0.1, 0.15, 0.2, 0.3)) for count in range(2, 7)},
+        contract_discounts={'1 year': 0, '2 year': 10},
+        access_method_factors=factors,
+        licenses={'Ticket size': (5000, 50000), '# licenses': (1, 2)},
+        variable_costs={'Product module': ()},
+        labels={'Label name': (LABEL,), 'A': (rng.randint(0, 3),), 'B': (rng.randint(1, 3),)},
+        label_requirements={'A': names[0], 'B': names[1]},
+    )
+
+
+def exhaustive(engine, spec, labels, modules, access_methods, allow_extras, strict):
+    """Lowest total of every valid configuration covering the requirements, or None."""
+    label_ids = engine.module_ids_for(labels)
+    required = set(modules) | set(labels)
+    for requirements in engine.labels.missing(label_ids, engine.module_names).values():
+        required.update(module for module, _ in requirements)
+    fillers = [name for name in engine.module_names if name not in required and name not in engine.labels.labels]
+    best = None
+    for key, factor in engine_factors(engine).items():
+        selected = [method for method, on in zip(ACCESS_METHODS, key) if on]
+        if not set(access_methods) <= set(selected):
+            continue
+        for count in range(len(fillers) + 1 if allow_extras else 1):
+            for extras in itertools.combinations(fillers, count):
+                chosen = sorted(required | set(extras))
+                ids = engine.module_ids_for(chosen)
+                available = [[engine.availability[i, ACCESS_METHODS.index(method)] for method in selected] for i in ids]
+                if not all(all(row) if strict else any(row) for row in available):
+                    continue
+                total = (engine.prices[ids].sum() * engine.aum_brackets[spec['aum']]
+                         * engine.exchange_rates[spec['currency']] * (1 + factor)
+                         * (1 - engine.calculate_discount(len(ids)))
+                         * (1 - engine.contract_discounts[spec['contract_length']] / 100))
+                if best is None or total < best:
+                    best = total
+    return best
+
+
+def engine_factors(engine):
+    return {tuple(bool(mask >> i & 1) for i in range(len(ACCESS_METHODS))): engine.access_factors[mask]
+            for mask in range(1, len(engine.access_factors)) if engine.priced_access[mask]}
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_cheapest_matches_exhaustive_search(seed):
+    rng = random.Random(seed)
+    engine = random_engine(rng)
+    solver = BundleSolver(engine)
+    for _ in range(4):
+        spec = {'currency': rng.choice(('EUR', 'USD')), 'aum': rng.choice(('Small', 'Large')),
+                'contract_length': rng.choice(('1 year', '2 year'))}
+        labels = [LABEL] if rng.random() < 0.5 else []
+        modules = rng.sample(engine.module_names[:-1], rng.randint(0 if labels else 1, 2))
+        access_methods = rng.sample(ACCESS_METHODS, rng.randint(0, 1))
+        allow_extras, strict = rng.random() < 0.7, rng.random() < 0.3
+
+        expected = exhaustive(engine, spec, labels, modules, access_methods, allow_extras, strict)
+        bundle = solver.cheapest(spec['currency'], spec['aum'], spec['contract_length'], labels, modules,
+                                 access_methods, allow_extras, strict)
+        if expected is None:
+            assert bundle is None
+            continue
+        assert bundle is not None
+        assert bundle.quote.total_price == pytest.approx(expected, rel=1e-12)
+        assert set(modules) | set(labels) <= set(bundle.modules)
+        assert set(access_methods) <= set(bundle.access_methods)
+        assert not bundle.quote.missing_requirements
+        if strict:
+            assert not bundle.quote.incompatible
@@ -0,0 +1,56 @@
+class QuoteWorkspace:
+    """Named quote variants for one client, priced side by side.
+
+    Variants are canonical QuoteSpecs (see QuoteEngine.canonical_spec). Each
+    priced variant is kept with the spec and snapshot version it was priced
+    under, so `price()` only requotes variants that were added or changed
+    since, or all of them after a price list update. Variants sharing a
+    currency, AuM bracket and access methods share one vector of per-module
+    base prices.
+    """
+
+    def __init__(self):
+        self.variants = {}
+        self.errors = {}
+        self.repriced = 0
+        self._results = {}
+        self._base_prices = {}
+
+    def __len__(self):
+        return len(self.variants)
+
+    def save(self, name, spec):
+        self.variants[name] = spec
+
+    def remove(self, name):
+        self.variants.pop(name, None)
+
+    def price(self, engine, version):
+        """{name: QuoteResult} for every variant that prices; the others are listed in `errors`."""
+        results, self.errors, self.repriced = {}, {}, 0
+        used = set()
+        for name, spec in self.variants.items():
+            try:
+                # A variant saved under an older price list may refer to a withdrawn module
+                engine.check_spec(spec)
+            except ValueError as e:
+                self.errors[name] = str(e)
+                continue
+            key = (version, spec.currency, spec.aum, engine.access_mask(spec.access_methods))
+            used.add(key)
+            cached = self._results.get(name)
+            if cached is not None and cached[0] == version and cached[1] == spec:
+                results[name] = cached[2]
+                continue
+            base_prices = self._base_prices.get(key)
+            if base_prices is None:
+                base_prices = self._base_prices[key] = engine.base_prices(spec.currency, spec.aum,
+                                                                          spec.access_methods)
+            results[name] = engine.quote(spec, base_prices=base_prices)
+            self._results[name] = (version, spec, results[name])
+            self.repriced += 1
+
+        # Forget results and base prices no current variant needs
+        self._results = {name: self._results[name] for name in results}
+        self._base_prices = {key: prices for key, prices in self._base_prices.items() if key in used}
+        return results